@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+# Command line options shared by the gsps-cli, gsps2nc and gsps-inproc
+# entry points.
+
+import os
+import sys
+import json
+
+from gsps.scheduler import SCHEDULE_POLICIES
+
+import logging
+logger = logging.getLogger(__name__)
+
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def env_flag(name):
+    """Whether an environmental variable is set to 1, true or yes
+    """
+    return os.environ.get(name, '').strip().lower() in TRUE_VALUES
+
+
+def strip_trailing_slash(path):
+    if path and path[-1] == '/':
+        return path[:-1]
+    return path
+
+
+def add_watcher_arguments(parser):
+    """Options shared by every entry point that watches glider data
+    """
+    parser.add_argument(
+        "-d",
+        "--data_path",
+        help="Path to Glider data directory",
+        default=os.environ.get('GDB_DATA_DIR')
+    )
+    parser.add_argument(
+        "--block_size",
+        help="Number of rows to publish per set_block message. "
+             "Default is 0, which publishes one set_data message per row.",
+        type=int,
+        default=int(os.environ.get('GSPS_BLOCK_SIZE', 0))
+    )
+    parser.add_argument(
+        "--schedule_policy",
+        help="Order to publish each glider's pending pairs in. 'newest' "
+             "publishes a new segment ahead of any backlog, 'fifo' publishes "
+             "pairs in the order they arrive.  Default is 'newest'.",
+        choices=SCHEDULE_POLICIES,
+        default=os.environ.get('GSPS_SCHEDULE_POLICY', 'newest')
+    )
+    parser.add_argument(
+        "--sensors",
+        help="JSON file containing a list of sensors to publish. "
+             "Default is to publish every sensor.",
+        default=os.environ.get('GSPS_SENSORS')
+    )
+
+
+def load_sensors(path):
+    with open(path, 'r') as f:
+        return json.loads(f.read())
+
+
+def processor_options(parser, args):
+    """Checks the watcher options and returns the GliderFileProcessor
+    keyword arguments they set
+    """
+    if not args.data_path:
+        logger.error("Please provide a --data_path attribute or set the GDB_DATA_DIR "
+                     "environmental variable")
+        sys.exit(parser.print_usage())
+
+    sensors = None
+    if args.sensors:
+        sensors = load_sensors(args.sensors)
+
+    return {
+        'block_size': args.block_size,
+        'sensors': sensors,
+        'schedule_policy': args.schedule_policy
+    }
+
+
+def add_writer_arguments(parser):
+    """Options shared by every entry point that writes NetCDF files
+    """
+    parser.add_argument(
+        "--configs",
+        help="Folder to look for NetCDF global and glider "
+             "JSON configuration files.  Default is './config'.",
+        default=os.environ.get('GSPS2NC_CONFIG', './config')
+    )
+    parser.add_argument(
+        "--output",
+        help="Where to place the newly generated netCDF files.",
+        default=os.environ.get('GSPS2NC_OUTPUT')
+    )
+    parser.add_argument(
+        "--catalog",
+        help="SQLite catalog of the written netCDF files.  "
+             "Default is 'catalog.sqlite' in the output directory.",
+        default=os.environ.get('GSPS2NC_CATALOG')
+    )
+    parser.add_argument(
+        "--profiles",
+        help="Output one netCDF file per profile instead of one per segment.",
+        action='store_true',
+        default=env_flag('GSPS2NC_PROFILES')
+    )
+    parser.add_argument(
+        "--profile_workers",
+        help="Number of processes writing profile files.  Default is 1.",
+        type=int,
+        default=int(os.environ.get('GSPS2NC_PROFILE_WORKERS', 1))
+    )
+
+
+def writer_configs(parser, args):
+    """Checks the writer options and loads the configs they point to
+    """
+    if not args.output:
+        logger.error("Please provide an --output argument or set the "
+                     "GSPS2NC_OUTPUT environmental variable")
+        sys.exit(parser.print_usage())
+
+    from gsps.nc import load_configs
+
+    configs = load_configs(strip_trailing_slash(args.configs))
+    configs['output_directory'] = strip_trailing_slash(args.output)
+    configs['catalog'] = args.catalog
+    configs['profile_files'] = args.profiles
+    configs['profile_workers'] = args.profile_workers
+    return configs
@@ -27,6 +27,11 @@ from pyinotify import (
     IN_MOVED_TO
 )
 
+from gsps.arguments import (
+    add_watcher_arguments,
+    processor_options,
+    strip_trailing_slash
+)
 from gsps.processor import GliderFileProcessor
 
 import logging
@@ -34,6 +39,18 @@ logging.captureWarnings(True)
 logger = logging.getLogger(__name__)
 
 
+def watch_data_path(data_path):
+    wm = WatchManager()
+    mask = IN_MOVED_TO | IN_CLOSE_WRITE
+    wm.add_watch(
+        data_path,
+        mask,
+        rec=True,
+        auto_add=True
+    )
+    return wm
+
+
 def main():
     logger.setLevel(logging.INFO)
     logger.addHandler(logging.StreamHandler())
@@ -43,12 +60,7 @@ def main():
         description="Monitor a directory for new glider data. "
                     "Announce changes via ZMQ."
     )
-    parser.add_argument(
-        "-d",
-        "--data_path",
-        help="Path to Glider data directory",
-        default=os.environ.get('GDB_DATA_DIR')
-    )
+    add_watcher_arguments(parser)
     parser.add_argument(
         "--zmq_url",
         help='Port to publish ZMQ messages on. '
@@ -64,36 +76,24 @@ def main():
 
     args = parser.parse_args()
 
-    if not args.data_path:
-        logger.error("Please provide a --data_path attribute or set the GDB_DATA_DIR "
-                     "environmental variable")
-        sys.exit(parser.print_usage())
-
-    monitor_path = args.data_path
-    if monitor_path[-1] == '/':
-        monitor_path = monitor_path[:-1]
-
-    wm = WatchManager()
-    mask = IN_MOVED_TO | IN_CLOSE_WRITE
-    wm.add_watch(
-        args.data_path,
-        mask,
-        rec=True,
-        auto_add=True
-    )
+    options = processor_options(parser, args)
+    data_path = strip_trailing_slash(args.data_path)
+    wm = watch_data_path(data_path)
 
-    processor = GliderFileProcessor(zmq_url=args.zmq_url)
+    processor = GliderFileProcessor(zmq_url=args.zmq_url, **options)
     notifier = Notifier(wm, processor)
 
     try:
         logger.info("Watching {}\nPublishing to {}".format(
-            args.data_path,
+            data_path,
             args.zmq_url)
         )
         notifier.loop(daemonize=args.daemonize)
     except NotifierError:
         logger.exception('Unable to start notifier loop')
         return 1
+    finally:
+        processor.stop()
 
     logger.info("GSPS Exited Successfully")
     return 0
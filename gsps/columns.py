@@ -0,0 +1,556 @@
+#!/usr/bin/env python
+
+# Columnar representation of glider flight and science data
+#
+# The rows gutils.gbdr.GliderBDReader yields for a .?bd file are
+# converted once into one NumPy array of values per sensor plus the rows
+# that sensor reported in.  Flight and science columns are then merged
+# on timestamp with a sorted-array join that reproduces the rows yielded
+# by gutils.gbdr.MergedGliderBDReader.
+
+import base64
+
+import numpy as np
+
+import logging
+logger = logging.getLogger(__name__)
+
+TIMESTAMP_KEY = 'timestamp'
+
+
+ROWS_PER_CHUNK = 1024
+
+
+class GliderColumns(object):
+    """Per-sensor arrays for a glider data file or merged pair
+
+    Each sensor is stored sparsely: `indexes[key]` holds the sorted rows
+    in which the sensor reported and `data[key]` the values it reported
+    in those rows.  Rows missing a sensor never contain that key when
+    converted back to dictionaries.
+    """
+
+    def __init__(self, keys, indexes, data, length):
+        self.keys = keys
+        self.indexes = indexes
+        self.data = data
+        self.length = length
+
+    def __len__(self):
+        return self.length
+
+    @classmethod
+    def from_rows(cls, rows, keys=None):
+        """Builds columns from an iterable of row dictionaries,
+        such as a gutils.gbdr.GliderBDReader, in a single pass
+
+        With keys, only those sensors and the timestamp are kept.  Every
+        row is kept, even if only its timestamp is left.
+        """
+        if keys is not None:
+            keys = set(keys)
+            keys.add(TIMESTAMP_KEY)
+        selected = keys
+        keys = []
+        reported = {}
+        length = 0
+        for index, row in enumerate(rows):
+            for key, value in row.items():
+                column = reported.get(key)
+                if column is None:
+                    if selected is not None and key not in selected:
+                        continue
+                    column = reported[key] = ([], [])
+                    keys.append(key)
+                column[0].append(index)
+                column[1].append(value)
+            length = index + 1
+
+        indexes = {}
+        data = {}
+        for key in keys:
+            column_indexes, column_data = reported.pop(key)
+            indexes[key] = np.array(column_indexes, dtype=np.intp)
+            data[key] = np.array(column_data)
+
+        return cls(keys, indexes, data, length)
+
+    def drop_empty_rows(self):
+        """Columns without the rows in which no sensor but the timestamp
+        reported
+
+        Row order is kept and arrays of sensors are shared with this set.
+        """
+        reported = np.zeros(len(self), dtype=bool)
+        for key in self.keys:
+            if key != TIMESTAMP_KEY:
+                reported[self.indexes[key]] = True
+        positions = np.cumsum(reported) - 1
+
+        indexes = {}
+        data = {}
+        for key in self.keys:
+            if key == TIMESTAMP_KEY:
+                kept = reported[self.indexes[key]]
+                indexes[key] = positions[self.indexes[key][kept]]
+                data[key] = self.data[key][kept]
+            else:
+                indexes[key] = positions[self.indexes[key]]
+                data[key] = self.data[key]
+
+        return GliderColumns(
+            list(self.keys),
+            indexes,
+            data,
+            int(np.count_nonzero(reported))
+        )
+
+    def timestamps(self):
+        if len(self.indexes.get(TIMESTAMP_KEY, ())) != len(self):
+            raise ValueError('Every row needs a timestamp')
+        return self.data[TIMESTAMP_KEY]
+
+    def present(self, key):
+        """Boolean mask of the rows in which a sensor reported
+        """
+        mask = np.zeros(len(self), dtype=bool)
+        if key in self.indexes:
+            mask[self.indexes[key]] = True
+        return mask
+
+    def column(self, key, fill_value):
+        """Dense values of a sensor with fill_value where it did not report
+        """
+        if key in self.data:
+            dtype = np.result_type(self.data[key].dtype, type(fill_value))
+        else:
+            dtype = type(fill_value)
+        column = np.full(len(self), fill_value, dtype=dtype)
+        if key in self.indexes:
+            column[self.indexes[key]] = self.data[key]
+        return column
+
+    def __bounds(self, starts):
+        """Positions in each sensor's rows at which the ranges beginning
+        at `starts` and ending at len(self) start
+        """
+        ends = np.append(starts, len(self))
+        return {
+            key: np.searchsorted(self.indexes[key], ends).tolist()
+            for key in self.keys
+        }
+
+    def rows(self, chunk_size=ROWS_PER_CHUNK):
+        """Yields each row as the dictionary the row-wise readers produce
+
+        Rows are built a chunk at a time so only chunk_size rows exist
+        at once.
+        """
+        starts = np.arange(0, len(self), chunk_size)
+        bounds = self.__bounds(starts)
+        for number, start in enumerate(starts.tolist()):
+            end = min(start + chunk_size, len(self))
+            rows = [{} for _ in range(end - start)]
+            for key in self.keys:
+                low = bounds[key][number]
+                high = bounds[key][number + 1]
+                if low == high:
+                    continue
+                offsets = (self.indexes[key][low:high] - start).tolist()
+                values = self.data[key][low:high].tolist()
+                for offset, value in zip(offsets, values):
+                    rows[offset][key] = value
+            for row in rows:
+                yield row
+
+    def blocks(self, block_size):
+        """Yields contiguous blocks of at most `block_size` rows
+
+        Numeric sensors sharing a dtype are packed into one group per
+        block, so encoding a block costs the same however many sensors
+        report in it.  See decode_block for the block format.
+        """
+        block_size = max(int(block_size), 1)
+        starts = np.arange(0, len(self), block_size)
+
+        numeric = {}
+        other = []
+        for key in self.keys:
+            dtype = self.data[key].dtype
+            if dtype.kind in 'biuf':
+                numeric.setdefault(dtype.newbyteorder('<'), []).append(key)
+            else:
+                other.append(key)
+
+        groups = []
+        for dtype, keys in numeric.items():
+            key_ids = np.repeat(
+                np.arange(len(keys), dtype=np.intp),
+                [len(self.indexes[key]) for key in keys]
+            )
+            rows = np.concatenate([self.indexes[key] for key in keys])
+            values = np.concatenate([self.data[key] for key in keys])
+
+            # Stable, so each block keeps sensors in order and rows
+            # in order within a sensor
+            block_ids = rows // block_size
+            order = np.argsort(block_ids, kind='stable')
+            block_ids = block_ids[order]
+            groups.append((
+                dtype,
+                keys,
+                key_ids[order],
+                rows[order],
+                values[order].astype(dtype),
+                np.searchsorted(
+                    block_ids, np.arange(len(starts) + 1)
+                ).tolist()
+            ))
+
+        other_bounds = self.__bounds(starts) if other else {}
+        for number, start in enumerate(starts.tolist()):
+            length = min(start + block_size, len(self)) - start
+            block = {'length': length, 'groups': []}
+
+            for dtype, keys, key_ids, rows, values, bounds in groups:
+                low = bounds[number]
+                high = bounds[number + 1]
+                if low == high:
+                    continue
+                block['groups'].append(_encode_group(
+                    length,
+                    dtype,
+                    keys,
+                    key_ids[low:high],
+                    rows[low:high] - start,
+                    values[low:high]
+                ))
+
+            if other:
+                block['columns'] = {}
+            for key in other:
+                low = other_bounds[key][number]
+                high = other_bounds[key][number + 1]
+                if low == high:
+                    continue
+                block['columns'][key] = {
+                    'index': (self.indexes[key][low:high] - start).tolist(),
+                    'values': self.data[key][low:high].tolist()
+                }
+
+            yield block
+
+    @classmethod
+    def from_blocks(cls, blocks):
+        """Builds columns from consecutive blocks made by blocks()
+
+        Each group is decoded as a whole and sorted into sensors once
+        all blocks are read.
+        """
+        keys = []
+        key_ids = {}
+        numeric = {}
+        pieces = {}
+        length = 0
+        for block in blocks:
+            for group in block['groups']:
+                for key in group['keys']:
+                    if key not in key_ids:
+                        key_ids[key] = len(keys)
+                        keys.append(key)
+
+                offsets, values = _decode_group(block['length'], group)
+                ids = np.repeat(
+                    [key_ids[key] for key in group['keys']],
+                    group['counts']
+                )
+                decoded = numeric.setdefault(values.dtype, ([], [], []))
+                decoded[0].append(ids)
+                decoded[1].append(offsets + length)
+                decoded[2].append(values)
+
+            for key, column in block.get('columns', {}).items():
+                if key not in key_ids:
+                    key_ids[key] = len(keys)
+                    keys.append(key)
+                pieces.setdefault(key, []).append((
+                    np.array(column['index'], dtype=np.intp) + length,
+                    np.array(column['values'])
+                ))
+
+            length += block['length']
+
+        for ids, rows, values in numeric.values():
+            ids = np.concatenate(ids)
+            order = np.argsort(ids, kind='stable')
+            counts = np.bincount(ids, minlength=len(keys))
+            splits = np.cumsum(counts)[:-1]
+            rows = np.split(np.concatenate(rows)[order], splits)
+            values = np.split(np.concatenate(values)[order], splits)
+            for key_id in np.flatnonzero(counts).tolist():
+                pieces.setdefault(keys[key_id], []).append(
+                    (rows[key_id], values[key_id])
+                )
+
+        indexes = {}
+        data = {}
+        for key in keys:
+            key_pieces = pieces[key]
+            if len(key_pieces) == 1:
+                indexes[key], data[key] = key_pieces[0]
+                continue
+
+            # Only a sensor with more than one dtype is split up
+            rows = np.concatenate([piece[0] for piece in key_pieces])
+            values = np.concatenate([piece[1] for piece in key_pieces])
+            order = np.argsort(rows, kind='stable')
+            indexes[key] = rows[order]
+            data[key] = values[order]
+
+        return cls(keys, indexes, data, length)
+
+
+def _encode_array(array):
+    return base64.b64encode(np.ascontiguousarray(array).tobytes()).decode()
+
+
+def _decode_array(encoded, dtype):
+    return np.frombuffer(base64.b64decode(encoded), dtype=dtype)
+
+
+def _encode_group(length, dtype, keys, key_ids, offsets, values):
+    """Encodes the values of sensors sharing a dtype within a block
+    """
+    counts = np.bincount(key_ids, minlength=len(keys))
+    present = np.flatnonzero(counts)
+    sparse = counts[key_ids] != length
+    return {
+        'dtype': dtype.str,
+        'keys': [keys[key_id] for key_id in present.tolist()],
+        'counts': counts[present].tolist(),
+        'index': _encode_array(offsets[sparse].astype('<u4')),
+        'values': _encode_array(values)
+    }
+
+
+def _decode_group(length, group):
+    """Row offset and value of every entry in an encoded group
+    """
+    counts = np.array(group['counts'], dtype=np.intp)
+    values = _decode_array(group['values'], group['dtype'])
+
+    dense = counts == length
+    offsets = np.empty(len(values), dtype=np.intp)
+    sparse = np.repeat(~dense, counts)
+    offsets[sparse] = _decode_array(group['index'], '<u4')
+    offsets[~sparse] = np.tile(
+        np.arange(length, dtype=np.intp),
+        int(np.count_nonzero(dense))
+    )
+    return offsets, values
+
+
+def decode_block(block):
+    """Yields (key, row offsets, values) for each sensor in a block
+
+    A block is a dictionary with:
+    * length: Number of rows in the block
+    * groups: One per numeric dtype, with the dtype, the sensors
+      reporting in the block, how many values each reported and the
+      base64 encoded little-endian arrays of row offsets and values.
+      Offsets are left out for sensors that reported in every row.
+    * columns: Row offsets and values of any non-numeric sensors as lists
+
+    Values sent as arrays are neither formatted nor parsed as text and
+    come back exactly.
+    """
+    length = block['length']
+    for group in block['groups']:
+        offsets, values = _decode_group(length, group)
+        position = 0
+        for key, count in zip(group['keys'], group['counts']):
+            yield (
+                key,
+                offsets[position:position + count],
+                values[position:position + count]
+            )
+            position += count
+
+    for key, column in block.get('columns', {}).items():
+        yield (
+            key,
+            np.array(column['index'], dtype=np.intp),
+            np.array(column['values'])
+        )
+
+
+def header_key(header):
+    return header['name'] + '-' + header['units']
+
+
+def project_headers(headers, sensors):
+    """Headers selected by a sensor projection
+
+    Sensors may be given by name (m_depth) or by row key (m_depth-m).
+    """
+    sensors = set(sensors)
+    return [
+        header for header in headers
+        if header['name'] in sensors or header_key(header) in sensors
+    ]
+
+
+def block_rows(block):
+    """Expands a block back into row dictionaries
+    """
+    rows = [{} for _ in range(block['length'])]
+    for key, offsets, values in decode_block(block):
+        for offset, value in zip(offsets.tolist(), values.tolist()):
+            rows[offset][key] = value
+    return rows
+
+
+def _ranks(timestamps):
+    """Position of each timestamp within its run of equal timestamps
+    """
+    indexes = np.arange(len(timestamps))
+    return indexes - np.searchsorted(timestamps, timestamps, side='left')
+
+
+def _is_sorted(timestamps):
+    return bool(np.all(timestamps[:-1] <= timestamps[1:]))
+
+
+def _merge_join_indexes(flight_times, science_times):
+    """Row-by-row merge join for timestamps that are not monotonic
+    """
+    flight_indexes = []
+    science_indexes = []
+    i = 0
+    j = 0
+    while i < len(flight_times) or j < len(science_times):
+        if j >= len(science_times) or (
+                i < len(flight_times) and
+                flight_times[i] < science_times[j]):
+            flight_indexes.append(i)
+            science_indexes.append(-1)
+            i += 1
+        elif i >= len(flight_times) or science_times[j] < flight_times[i]:
+            flight_indexes.append(-1)
+            science_indexes.append(j)
+            j += 1
+        else:
+            flight_indexes.append(i)
+            science_indexes.append(j)
+            i += 1
+            j += 1
+
+    return (
+        np.array(flight_indexes, dtype=np.intp),
+        np.array(science_indexes, dtype=np.intp)
+    )
+
+
+def merge_join_indexes(flight_times, science_times):
+    """Computes the merged row order of a flight and science file
+
+    Returns two index arrays the length of the merged set.  Each entry
+    is the source row in the flight or science columns, or -1 if that
+    file has no row at the merged position.  Equal timestamps pair up
+    one-to-one in file order, the same way a merge join over the two
+    row streams does.
+    """
+    if not (_is_sorted(flight_times) and _is_sorted(science_times)):
+        logger.debug('Timestamps not sorted, falling back to row merge')
+        return _merge_join_indexes(flight_times, science_times)
+
+    flight_count = len(flight_times)
+    science_count = len(science_times)
+
+    times = np.concatenate((flight_times, science_times))
+    sources = np.concatenate((
+        np.zeros(flight_count, dtype=np.int8),
+        np.ones(science_count, dtype=np.int8)
+    ))
+    indexes = np.concatenate((
+        np.arange(flight_count, dtype=np.intp),
+        np.arange(science_count, dtype=np.intp)
+    ))
+    ranks = np.concatenate((_ranks(flight_times), _ranks(science_times)))
+
+    order = np.lexsort((sources, ranks, times))
+    times = times[order]
+    sources = sources[order]
+    indexes = indexes[order]
+    ranks = ranks[order]
+
+    # A flight row directly followed by the science row with the same
+    # timestamp and rank becomes a single merged row
+    paired = np.zeros(len(order), dtype=bool)
+    paired[:-1] = (
+        (sources[:-1] == 0) &
+        (sources[1:] == 1) &
+        (times[:-1] == times[1:]) &
+        (ranks[:-1] == ranks[1:])
+    )
+    absorbed = np.zeros(len(order), dtype=bool)
+    absorbed[1:] = paired[:-1]
+    keep = ~absorbed
+
+    flight_indexes = np.where(sources == 0, indexes, -1)
+    science_indexes = np.where(sources == 1, indexes, -1)
+    paired_positions = np.flatnonzero(paired)
+    science_indexes[paired_positions] = indexes[paired_positions + 1]
+
+    return flight_indexes[keep], science_indexes[keep]
+
+
+def _merged_positions(source_indexes, count):
+    """Merged row position of each row of a source file
+    """
+    positions = np.empty(count, dtype=np.intp)
+    rows = np.flatnonzero(source_indexes >= 0)
+    positions[source_indexes[rows]] = rows
+    return positions
+
+
+def merge_columns(flight, science):
+    """Merges flight and science columns on timestamp
+
+    Produces the same rows as gutils.gbdr.MergedGliderBDReader.  Where
+    both files report the same key in a merged row, the science value
+    wins, as it would in `flight_row.update(science_row)`.  Sensors
+    reported by only one file keep their value arrays uncopied.
+    """
+    empty = np.zeros(0)
+    flight_times = flight.timestamps() if len(flight) else empty
+    science_times = science.timestamps() if len(science) else empty
+    flight_indexes, science_indexes = (
+        merge_join_indexes(flight_times, science_times)
+    )
+    flight_positions = _merged_positions(flight_indexes, len(flight))
+    science_positions = _merged_positions(science_indexes, len(science))
+
+    keys = list(flight.keys)
+    keys.extend(key for key in science.keys if key not in flight.indexes)
+
+    indexes = {}
+    data = {}
+    for key in keys:
+        if key not in science.indexes:
+            indexes[key] = flight_positions[flight.indexes[key]]
+            data[key] = flight.data[key]
+        elif key not in flight.indexes:
+            indexes[key] = science_positions[science.indexes[key]]
+            data[key] = science.data[key]
+        else:
+            # Science first so np.unique keeps its value for shared rows
+            positions = np.concatenate((
+                science_positions[science.indexes[key]],
+                flight_positions[flight.indexes[key]]
+            ))
+            values = np.concatenate((science.data[key], flight.data[key]))
+            indexes[key], first = np.unique(positions, return_index=True)
+            data[key] = values[first]
+
+    return GliderColumns(keys, indexes, data, len(flight_indexes))
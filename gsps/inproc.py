@@ -0,0 +1,121 @@
+#!/usr/bin/env python
+
+# Runs the glider directory watcher and the NetCDF writer in a single
+# process.  Merged columns are handed from the watcher to the writer
+# through an in-memory queue without being serialized or copied.
+# Publishing to a ZMQ socket for other subscribers is optional.
+
+import os
+import sys
+import argparse
+from queue import Queue
+from threading import Thread
+
+from pyinotify import Notifier, NotifierError
+
+from gsps.arguments import (
+    add_watcher_arguments,
+    add_writer_arguments,
+    processor_options,
+    strip_trailing_slash,
+    writer_configs
+)
+from gsps.cli import watch_data_path
+from gsps.processor import GliderFileProcessor
+from gsps.nc import (
+    message_handlers,
+    start_profile_writers,
+    stop_profile_writers
+)
+
+import logging
+logging.captureWarnings(True)
+logger = logging.getLogger(__name__)
+
+
+def consume_messages(configs, sets, messages):
+    """Hands queued messages to the gsps.nc message handlers until
+    a None message is received
+    """
+    while True:
+        message = messages.get()
+        if message is None:
+            break
+
+        try:
+            if message['message_type'] in message_handlers:
+                message_type = message['message_type']
+                message_handlers[message_type](configs, sets, message)
+        except BaseException:
+            logger.exception(
+                'Error handling {} message'.format(message['message_type'])
+            )
+
+
+def main():
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+    logging.getLogger('py.warnings').setLevel(logging.ERROR)
+
+    parser = argparse.ArgumentParser(
+        description="Monitor a directory for new glider data and output "
+                    "a new NetCDF for each set, all in one process."
+    )
+    add_watcher_arguments(parser)
+    add_writer_arguments(parser)
+    parser.add_argument(
+        "--zmq_url",
+        help='Optional port to also publish ZMQ messages on.',
+        default=os.environ.get('ZMQ_URL')
+    )
+
+    args = parser.parse_args()
+
+    options = processor_options(parser, args)
+    configs = writer_configs(parser, args)
+    data_path = strip_trailing_slash(args.data_path)
+
+    # Before the writer, scheduler and ZMQ threads start
+    start_profile_writers(configs)
+
+    sets = {}
+    messages = Queue()
+    writer = Thread(
+        target=consume_messages,
+        args=(configs, sets, messages)
+    )
+    writer.start()
+
+    wm = watch_data_path(data_path)
+
+    processor = GliderFileProcessor(
+        zmq_url=args.zmq_url,
+        consumers=[messages.put],
+        **options
+    )
+    notifier = Notifier(wm, processor)
+
+    status = 0
+    try:
+        logger.info("Watching {}\nLoading configuration from {}\nSaving to {}".format(
+            data_path,
+            args.configs,
+            configs['output_directory'])
+        )
+        if args.zmq_url:
+            logger.info("Publishing to {}".format(args.zmq_url))
+        notifier.loop()
+    except NotifierError:
+        logger.exception('Unable to start notifier loop')
+        status = 1
+    finally:
+        processor.stop()
+        messages.put(None)
+        writer.join()
+        stop_profile_writers(configs)
+
+    logger.info('Stopped')
+    return status
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,6 +4,7 @@ import os
 import json
 import shutil
 import tempfile
+import multiprocessing
 from glob import glob
 from threading import Thread
 
@@ -23,6 +24,12 @@ from gutils.gps import interpolate_gps
 from gutils.ctd import calculate_density
 from gutils.ctd import calculate_practical_salinity
 
+from gsps.columns import GliderColumns
+from gsps.nc.catalog import (
+    catalog_entry,
+    catalog_path,
+    record_file
+)
 from gsps.nc.generators import (
     generate_global_attributes,
     generate_filename,
@@ -40,8 +47,14 @@ class GliderDataset(object):
     def __init__(self, handler_dataset):
         self.glider = handler_dataset['glider']
         self.segment = handler_dataset['segment']
+        self.flight_file = handler_dataset.get('flight_file')
+        self.science_file = handler_dataset.get('science_file')
         self.headers = handler_dataset['headers']
-        self.__parse_lines(handler_dataset['lines'])
+        self.profile_ids = None
+        if handler_dataset.get('columns') is not None:
+            self.__parse_columns(handler_dataset['columns'])
+        else:
+            self.__parse_lines(handler_dataset['lines'])
         self.__interpolate_glider_gps()
         self.__calculate_salinity_and_density()
         self.__calculate_position_uv()
@@ -98,7 +111,30 @@ class GliderDataset(object):
                     datum = NC_FILL_VALUES['f8']
                 self.data_by_type[key].append(datum)
 
+        self.times = np.array(self.times)
+        for key, data in self.data_by_type.items():
+            self.data_by_type[key] = np.array(data)
+
+    def __parse_columns(self, columns):
+        self.time_uv = NC_FILL_VALUES['f8']
+        self.times = columns.timestamps()
+        self.data_by_type = {}
+
+        reported = columns.indexes.get('m_water_vx-m/s', [])
+        if 'm_water_vx-m/s' in self.headers and len(reported) > 0:
+            self.time_uv = self.times[reported[-1]]
+
+        for header in self.headers:
+            self.data_by_type[header] = columns.column(
+                header, NC_FILL_VALUES['f8']
+            )
+
     def calculate_profiles(self):
+        """Profile ID of each row.  The yo extrema are only found once.
+        """
+        if self.profile_ids is not None:
+            return self.profile_ids
+
         profiles = []
         if 'm_depth-m' in self.data_by_type:
             dataset = np.column_stack((
@@ -111,7 +147,8 @@ class GliderDataset(object):
             profiles = filter_profile_distance(profiles)
             profiles = filter_profile_number_of_points(profiles)
 
-        return profiles[:, 2]
+        self.profile_ids = profiles[:, 2]
+        return self.profile_ids
 
     def __calculate_position_uv(self):
         dataset = np.column_stack((
@@ -125,12 +162,86 @@ class GliderDataset(object):
         self.data_by_type['lon_uv-lon'] = [dataset[i, 2]]
 
 
-def write_netcdf(configs, sets, set_key):
-    dataset = GliderDataset(sets[set_key])
+class GliderProfile(object):
+    """Represents a single profile of a GliderDataset
 
-    # No longer need the dataset stored by handlers
-    del sets[set_key]
+    Per-row data are views into the arrays of the full dataset.
+    """
+
+    def __init__(self, dataset, profile_id, start, end):
+        self.glider = dataset.glider
+        self.segment = dataset.segment
+        self.flight_file = dataset.flight_file
+        self.science_file = dataset.science_file
+        self.profile_id = profile_id
+        self.time_uv = dataset.time_uv
+        self.times = dataset.times[start:end]
+        self.profile_ids = dataset.calculate_profiles()[start:end]
+
+        self.data_by_type = {}
+        for datatype, data in dataset.data_by_type.items():
+            if len(data) == len(dataset.times):
+                data = data[start:end]
+            self.data_by_type[datatype] = data
+
+    def calculate_profiles(self):
+        return self.profile_ids
+
+
+def in_profile(profile_ids):
+    """Mask of the rows that belong to a profile
+
+    Profile IDs from gutils.yo are times within each profile, so NaN,
+    the NetCDF fill value and anything not positive mark rows outside
+    of a profile.
+    """
+    profile_ids = np.asarray(profile_ids, dtype=np.float64)
+    with np.errstate(invalid='ignore'):
+        return (
+            np.isfinite(profile_ids) &
+            (profile_ids != NC_FILL_VALUES['f8']) &
+            (profile_ids > 0)
+        )
+
+
+def profile_slices(profile_ids):
+    """Returns (profile_id, start, end) for each run of rows
+    sharing a profile ID.  Rows not in a profile are skipped.
+    """
+    profile_ids = np.asarray(profile_ids, dtype=np.float64)
+    if len(profile_ids) == 0:
+        return []
+
+    boundaries = np.flatnonzero(profile_ids[1:] != profile_ids[:-1]) + 1
+    starts = np.concatenate(([0], boundaries))
+    ends = np.concatenate((boundaries, [len(profile_ids)]))
+
+    profiled = in_profile(profile_ids)
+
+    slices = []
+    for start, end in zip(starts, ends):
+        if not profiled[start]:
+            continue
+        slices.append((float(profile_ids[start]), int(start), int(end)))
+    return slices
+
+
+def deployment_path(configs, dataset):
+    path = os.path.join(
+        configs['output_directory'],
+        configs[dataset.glider]['deployment']['directory']
+    )
+
+    if not os.path.exists(path):
+        os.mkdir(path)
+
+    return path
 
+
+def write_dataset(configs, dataset):
+    """Writes a GliderDataset or GliderProfile to a new NetCDF file
+    in the deployment directory.  Returns the file path.
+    """
     global_attributes = (
         generate_global_attributes(configs, dataset)
     )
@@ -154,20 +265,122 @@ def write_netcdf(configs, sets, set_key):
         for datatype, data in dataset.data_by_type.items():
             glider_nc.insert_data(datatype, data)
 
-    deployment_path = os.path.join(
-        configs['output_directory'],
-        configs[dataset.glider]['deployment']['directory']
-    )
-
-    if not os.path.exists(deployment_path):
-        os.mkdir(deployment_path)
-
     filename = generate_filename(configs, dataset)
-    file_path = os.path.join(deployment_path, filename)
+    file_path = os.path.join(deployment_path(configs, dataset), filename)
     shutil.move(tmp_path, file_path)
 
     logger.info("Datafile written to %s" % file_path)
 
+    return file_path
+
+
+def write_profile(configs, dataset, profile_slice):
+    profile = GliderProfile(dataset, *profile_slice)
+    file_path = write_dataset(configs, profile)
+    return file_path, catalog_entry(profile, file_path)
+
+
+# Configs of a profile writer process, set once when it starts
+profile_writer_state = {}
+
+
+def init_profile_writer(configs):
+    profile_writer_state['configs'] = configs
+
+
+def write_profile_in_writer(profile):
+    file_path = write_dataset(profile_writer_state['configs'], profile)
+    return file_path, catalog_entry(profile, file_path)
+
+
+def start_profile_writers(configs):
+    """Starts configs['profile_workers'] processes to write profile files
+
+    Call at startup, before any threads exist.  Workers are started by a
+    forkserver, so neither they nor any replacement workers are forked
+    from a process running threads with HDF5 or ZMQ state.  The pool is
+    kept in configs['profile_pool'] and returned, or None when profiles
+    are written in this process.
+    """
+    workers = configs.get('profile_workers') or 1
+    if not configs.get('profile_files') or workers < 2:
+        return None
+
+    context = multiprocessing.get_context('forkserver')
+    pool = context.Pool(
+        workers,
+        initializer=init_profile_writer,
+        initargs=(dict(configs),)
+    )
+    configs['profile_pool'] = pool
+    return pool
+
+
+def stop_profile_writers(configs):
+    pool = configs.pop('profile_pool', None)
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+
+def write_profile_files(configs, dataset):
+    """Writes one NetCDF file per profile of the dataset
+
+    With a pool from start_profile_writers, each worker is sent only the
+    rows of the profiles it writes.  Returns a list of
+    (file path, catalog entry) for the written files.
+    """
+    profile_ids = dataset.calculate_profiles()
+    if len(profile_ids) != len(dataset.times):
+        raise ValueError(
+            'Expected {} profile IDs, got {}'.format(
+                len(dataset.times), len(profile_ids)
+            )
+        )
+
+    slices = profile_slices(profile_ids)
+    if len(slices) == 0:
+        logger.info(
+            "No profiles found for glider %s segment %s"
+            % (dataset.glider, dataset.segment)
+        )
+        return []
+
+    # Create the deployment directory before the writers race to
+    deployment_path(configs, dataset)
+
+    pool = configs.get('profile_pool')
+    if pool is not None and len(slices) > 1:
+        profiles = [
+            GliderProfile(dataset, *profile_slice)
+            for profile_slice in slices
+        ]
+        return pool.map(write_profile_in_writer, profiles)
+
+    return [
+        write_profile(configs, dataset, profile_slice)
+        for profile_slice in slices
+    ]
+
+
+def write_netcdf(configs, sets, set_key):
+    dataset = GliderDataset(sets[set_key])
+
+    # No longer need the dataset stored by handlers
+    del sets[set_key]
+
+    if configs.get('profile_files'):
+        written = write_profile_files(configs, dataset)
+    else:
+        file_path = write_dataset(configs, dataset)
+        written = [(file_path, catalog_entry(dataset, file_path))]
+
+    for file_path, entry in written:
+        try:
+            record_file(catalog_path(configs), entry)
+        except BaseException:
+            logger.exception('Error cataloging {}'.format(file_path))
+
 
 def handle_set_start(configs, sets, message):
     """Handles the set start message from the GSPS publisher
@@ -179,8 +392,12 @@ def handle_set_start(configs, sets, message):
     sets[set_key] = {
         'glider': message['glider'],
         'segment': message['segment'],
+        'flight_file': message.get('flight_file'),
+        'science_file': message.get('science_file'),
         'headers': [],
-        'lines': []
+        'lines': [],
+        'blocks': [],
+        'columns': None
     }
 
     for header in message['headers']:
@@ -210,6 +427,49 @@ def handle_set_data(configs, sets, message):
         )
 
 
+def handle_set_block(configs, sets, message):
+    """Handles a block of data coming in for a GSPS dataset
+
+    Blocks carry contiguous rows as encoded columns.  They are kept
+    as received and decoded into columns once the set ends.
+    """
+    set_key = generate_set_key(message)
+
+    if set_key in sets:
+        sets[set_key]['blocks'].append(message['data'])
+    else:
+        logger.error(
+            "Unknown dataset passed for key glider %s dataset @ %s"
+            % (message['glider'], message['start'])
+        )
+
+
+def handle_set_columns(configs, sets, message):
+    """Handles the merged columns of a GSPS dataset from an
+    in-process publisher
+
+    The columns are kept by reference and read directly when the
+    dataset is written.
+    """
+    set_key = generate_set_key(message)
+
+    if set_key in sets:
+        sets[set_key]['columns'] = message['data']
+    else:
+        logger.error(
+            "Unknown dataset passed for key glider %s dataset @ %s"
+            % (message['glider'], message['start'])
+        )
+
+
+def set_length(handler_dataset):
+    if handler_dataset.get('blocks'):
+        return sum(block['length'] for block in handler_dataset['blocks'])
+    if handler_dataset.get('columns') is not None:
+        return len(handler_dataset['columns'])
+    return len(handler_dataset['lines'])
+
+
 def handle_set_end(configs, sets, message):
     """Handles the set_end message coming from GSPS
 
@@ -221,13 +481,18 @@ def handle_set_end(configs, sets, message):
     set_key = generate_set_key(message)
 
     if set_key in sets:
-        if len(sets[set_key]['lines']) == 0:
+        if set_length(sets[set_key]) == 0:
             logger.info(
                 "Empty set: for glider %s dataset @ %s"
                 % (message['glider'], message['start'])
             )
             return  # No data in set, do nothing
 
+        if sets[set_key].get('blocks'):
+            sets[set_key]['columns'] = GliderColumns.from_blocks(
+                sets[set_key].pop('blocks')
+            )
+
         thread = Thread(
             target=write_netcdf,
             args=(configs, sets, set_key)
@@ -244,6 +509,8 @@ def handle_set_end(configs, sets, message):
 message_handlers = {
     'set_start': handle_set_start,
     'set_data': handle_set_data,
+    'set_block': handle_set_block,
+    'set_columns': handle_set_columns,
     'set_end': handle_set_end
 }
 
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+
+# Keeps a SQLite catalog of the NetCDF files written by gsps2nc.
+# Each file is recorded with its glider, segment, time and geospatial
+# bounds, row count and source flight/science files so outputs can be
+# found without opening every NetCDF header.  gsps.nc.catalog_cli
+# queries it from the command line.
+
+import os
+import sqlite3
+from datetime import datetime
+
+import numpy as np
+from netCDF4 import default_fillvals as NC_FILL_VALUES
+
+import logging
+logger = logging.getLogger(__name__)
+
+CATALOG_FILENAME = 'catalog.sqlite'
+
+CATALOG_COLUMNS = [
+    'file_path',
+    'glider',
+    'segment',
+    'profile',
+    'time_min',
+    'time_max',
+    'lat_min',
+    'lat_max',
+    'lon_min',
+    'lon_max',
+    'depth_min',
+    'depth_max',
+    'rows',
+    'flight_file',
+    'science_file',
+    'created'
+]
+
+CREATE_TABLE = '''
+CREATE TABLE IF NOT EXISTS files (
+    file_path TEXT PRIMARY KEY,
+    glider TEXT NOT NULL,
+    segment INTEGER,
+    profile REAL,
+    time_min REAL,
+    time_max REAL,
+    lat_min REAL,
+    lat_max REAL,
+    lon_min REAL,
+    lon_max REAL,
+    depth_min REAL,
+    depth_max REAL,
+    rows INTEGER,
+    flight_file TEXT,
+    science_file TEXT,
+    created TEXT
+)
+'''
+
+CREATE_INDEXES = [
+    'CREATE INDEX IF NOT EXISTS files_time ON files (time_min, time_max)',
+    'CREATE INDEX IF NOT EXISTS files_glider ON files (glider, segment)'
+]
+
+
+def catalog_path(configs):
+    """Catalog location from the configs, defaulting to the output directory
+    """
+    if configs.get('catalog'):
+        return configs['catalog']
+    return os.path.join(configs['output_directory'], CATALOG_FILENAME)
+
+
+def open_catalog(path):
+    connection = sqlite3.connect(path)
+    connection.row_factory = sqlite3.Row
+    with connection:
+        connection.execute(CREATE_TABLE)
+        for statement in CREATE_INDEXES:
+            connection.execute(statement)
+    return connection
+
+
+def valid_bounds(data):
+    """Minimum and maximum of the data ignoring NaN and NetCDF fill values
+    """
+    data = np.asarray(data, dtype=np.float64)
+    data = data[~np.isnan(data) & (data != NC_FILL_VALUES['f8'])]
+    if len(data) == 0:
+        return None, None
+    return float(data.min()), float(data.max())
+
+
+def catalog_entry(dataset, file_path):
+    """Builds the catalog entry for a GliderDataset or GliderProfile
+    written to file_path
+    """
+    data_by_type = dataset.data_by_type
+    empty = []
+
+    time_min, time_max = valid_bounds(dataset.times)
+    lat_min, lat_max = valid_bounds(data_by_type.get('lat-lat', empty))
+    lon_min, lon_max = valid_bounds(data_by_type.get('lon-lon', empty))
+    depth_min, depth_max = valid_bounds(data_by_type.get('m_depth-m', empty))
+
+    return {
+        'file_path': os.path.abspath(file_path),
+        'glider': dataset.glider,
+        'segment': dataset.segment,
+        'profile': getattr(dataset, 'profile_id', None),
+        'time_min': time_min,
+        'time_max': time_max,
+        'lat_min': lat_min,
+        'lat_max': lat_max,
+        'lon_min': lon_min,
+        'lon_max': lon_max,
+        'depth_min': depth_min,
+        'depth_max': depth_max,
+        'rows': len(dataset.times),
+        'flight_file': getattr(dataset, 'flight_file', None),
+        'science_file': getattr(dataset, 'science_file', None),
+        'created': datetime.utcnow().isoformat()
+    }
+
+
+def record_file(path, entry):
+    """Adds or replaces a file in the catalog
+    """
+    connection = open_catalog(path)
+    try:
+        with connection:
+            connection.execute(
+                'INSERT OR REPLACE INTO files (%s) VALUES (%s)' % (
+                    ', '.join(CATALOG_COLUMNS),
+                    ', '.join('?' * len(CATALOG_COLUMNS))
+                ),
+                [entry.get(column) for column in CATALOG_COLUMNS]
+            )
+    finally:
+        connection.close()
+
+
+def query_files(path, start=None, end=None, bbox=None, glider=None):
+    """Returns the catalog entries overlapping a time range and bounding box
+
+    bbox is (west, south, east, north) in decimal degrees.  Times are
+    UNIX timestamps.
+    """
+    clauses = []
+    parameters = []
+
+    if glider is not None:
+        clauses.append('glider = ?')
+        parameters.append(glider)
+
+    if start is not None:
+        clauses.append('time_max >= ?')
+        parameters.append(start)
+
+    if end is not None:
+        clauses.append('time_min <= ?')
+        parameters.append(end)
+
+    if bbox is not None:
+        west, south, east, north = bbox
+        clauses.extend([
+            'lon_max >= ?',
+            'lon_min <= ?',
+            'lat_max >= ?',
+            'lat_min <= ?'
+        ])
+        parameters.extend([west, east, south, north])
+
+    statement = 'SELECT * FROM files'
+    if clauses:
+        statement += ' WHERE ' + ' AND '.join(clauses)
+    statement += ' ORDER BY time_min'
+
+    connection = open_catalog(path)
+    try:
+        return [dict(row) for row in connection.execute(statement, parameters)]
+    finally:
+        connection.close()
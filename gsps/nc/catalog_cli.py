@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+# Lists the NetCDF files in a gsps2nc catalog that cover a time range
+# and bounding box.
+
+import os
+import sys
+import json
+import time
+import argparse
+import calendar
+
+from gsps.nc.catalog import CATALOG_FILENAME, query_files
+
+import logging
+logging.captureWarnings(True)
+logger = logging.getLogger(__name__)
+
+
+def parse_time(value):
+    """Parses a UNIX timestamp or an ISO 8601 UTC date or datetime
+    """
+    try:
+        return float(value)
+    except ValueError:
+        pass
+
+    for time_format in ('%Y-%m-%dT%H:%M:%SZ', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return calendar.timegm(time.strptime(value, time_format))
+        except ValueError:
+            continue
+
+    raise argparse.ArgumentTypeError('Invalid time: {}'.format(value))
+
+
+def main():
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+
+    parser = argparse.ArgumentParser(
+        description="Lists the NetCDF files in a gsps2nc catalog that "
+                    "cover a time range and bounding box."
+    )
+    parser.add_argument(
+        "--catalog",
+        help="Catalog to query.  Default is '{}' in the "
+             "GSPS2NC_OUTPUT directory.".format(CATALOG_FILENAME),
+        default=os.environ.get('GSPS2NC_CATALOG')
+    )
+    parser.add_argument(
+        "--start",
+        help="Only files with data at or after this UTC time.",
+        type=parse_time
+    )
+    parser.add_argument(
+        "--end",
+        help="Only files with data at or before this UTC time.",
+        type=parse_time
+    )
+    parser.add_argument(
+        "--bbox",
+        help="Only files overlapping this bounding box.",
+        nargs=4,
+        type=float,
+        metavar=('WEST', 'SOUTH', 'EAST', 'NORTH')
+    )
+    parser.add_argument(
+        "--glider",
+        help="Only files from this glider."
+    )
+    parser.add_argument(
+        "--json",
+        help="Print the full catalog entries as JSON.",
+        action='store_true'
+    )
+
+    args = parser.parse_args()
+
+    path = args.catalog
+    if not path and os.environ.get('GSPS2NC_OUTPUT'):
+        path = os.path.join(os.environ['GSPS2NC_OUTPUT'], CATALOG_FILENAME)
+
+    if not path or not os.path.exists(path):
+        logger.error("Please provide an existing --catalog or set the "
+                     "GSPS2NC_CATALOG or GSPS2NC_OUTPUT environmental variable")
+        sys.exit(parser.print_usage())
+
+    entries = query_files(
+        path,
+        start=args.start,
+        end=args.end,
+        bbox=args.bbox,
+        glider=args.glider
+    )
+
+    if args.json:
+        print(json.dumps(entries, indent=2))
+    else:
+        for entry in entries:
+            print(entry['file_path'])
+
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
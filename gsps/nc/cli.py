@@ -14,7 +14,12 @@ import sys
 import zmq
 import argparse
 
-from gsps.nc import load_configs, message_handlers
+from gsps.arguments import add_writer_arguments, writer_configs
+from gsps.nc import (
+    message_handlers,
+    start_profile_writers,
+    stop_profile_writers
+)
 
 import logging
 logging.captureWarnings(True)
@@ -37,37 +42,16 @@ def main():
              'Default is "tcp://127.0.0.1:44444".',
         default=os.environ.get('ZMQ_URL', 'tcp://127.0.0.1:44444')
     )
-    parser.add_argument(
-        "--configs",
-        help="Folder to look for NetCDF global and glider "
-             "JSON configuration files.  Default is './config'.",
-        default=os.environ.get('GSPS2NC_CONFIG', './config')
-    )
-    parser.add_argument(
-        "--output",
-        help="Where to place the newly generated netCDF files.",
-        default=os.environ.get('GSPS2NC_OUTPUT')
-    )
+    add_writer_arguments(parser)
 
     args = parser.parse_args()
 
-    if not args.output:
-        logger.error("Please provide an --output argument or set the "
-                     "GSPS2NC_OUTPUT environmental variable")
-        sys.exit(parser.print_usage())
-
-    configs_directory = args.configs
-    if configs_directory[-1] == '/':
-        configs_directory = configs_directory[:-1]
-    configs = load_configs(configs_directory)
-
-    output_directory = args.output
-    if output_directory[-1] == '/':
-        output_directory = output_directory[:-1]
-    configs['output_directory'] = output_directory
-
+    configs = writer_configs(parser, args)
     configs['zmq_url'] = args.zmq_url
 
+    # Before the ZMQ context starts its I/O threads
+    start_profile_writers(configs)
+
     context = zmq.Context()
     socket = context.socket(zmq.SUB)
     socket.connect(configs['zmq_url'])
@@ -78,7 +62,7 @@ def main():
     logger.info("Loading configuration from {}\nListening to {}\nSaving to {}".format(
         args.configs,
         args.zmq_url,
-        output_directory)
+        configs['output_directory'])
     )
 
     while True:
@@ -91,6 +75,7 @@ def main():
             logger.error("Subscriber exited: {}".format(e))
             break
 
+    stop_profile_writers(configs)
     logger.info('Stopped')
 
 if __name__ == '__main__':
@@ -6,9 +6,26 @@
 # ZMQ JSON Messages:
 # * set_start: Announces the start time and glider
 #   - Use start time and glider to differentiate sets if necessary
+#   - Headers only list the projected sensors when publishing
+#     with a sensor projection
+#   - Rows in which none of the projected sensors reported are
+#     left out of the set
 # * set_data: Announces a row of data
+#   - Without a block size, sensor projection or in-process consumers
+#     rows are streamed straight from MergedGliderBDReader
+# * set_block: Announces a contiguous block of rows as columns.
+#   - Sent instead of set_data when publishing with a block size
+#   - Numeric columns are base64 encoded arrays, see
+#     gsps.columns.encode_block
 # * set_end: Announces the end of a glider data set
 #
+# In-process consumers receive the same set_start and set_end messages
+# as dictionaries.  Instead of set_data they get a single set_columns
+# message carrying the merged gsps.columns.GliderColumns, uncopied.
+#
+# Pairs are published from a worker thread in the order chosen by
+# gsps.scheduler.SegmentScheduler rather than in file event order.
+#
 # By: Michael Lindemuth
 # University of South Florida
 # College of Marine Science
@@ -18,6 +35,7 @@ import os
 import zmq
 import time
 from datetime import datetime
+from threading import Thread
 
 from pyinotify import(
     ProcessEvent
@@ -28,6 +46,14 @@ from gutils.gbdr import (
     MergedGliderBDReader
 )
 
+from gsps.columns import (
+    GliderColumns,
+    header_key,
+    merge_columns,
+    project_headers
+)
+from gsps.scheduler import SegmentScheduler
+
 import logging
 logger = logging.getLogger(__name__)
 
@@ -36,16 +62,132 @@ FLIGHT_SCIENCE_PAIRS = [('dbd', 'ebd'), ('sbd', 'tbd'), ('mbd', 'nbd')]
 
 class GliderFileProcessor(ProcessEvent):
 
-    def my_init(self, zmq_url):
+    def my_init(self, zmq_url=None, block_size=0, sensors=None,
+                consumers=None, schedule_policy='newest'):
         self.zmq_url = zmq_url
+        self.block_size = block_size
+        self.sensors = sensors
+        self.consumers = consumers or []
 
         # Create ZMQ context and socket for publishing files
-        context = zmq.Context()
-        self.socket = context.socket(zmq.PUB)
-        self.socket.bind(self.zmq_url)
+        self.socket = None
+        if self.zmq_url:
+            context = zmq.Context()
+            self.socket = context.socket(zmq.PUB)
+            self.socket.bind(self.zmq_url)
 
         self.glider_data = {}
 
+        # Publish pending pairs fairly across gliders.  The worker starts
+        # with the first pair so it runs in the daemonized process.
+        self.scheduler = SegmentScheduler(schedule_policy)
+        self.worker = None
+
+    def schedule(self, glider, path, file_base, pair):
+        if self.worker is None:
+            self.worker = Thread(target=self.publish_scheduled, daemon=True)
+            self.worker.start()
+        self.scheduler.add(glider, path, file_base, pair)
+
+    def publish_scheduled(self):
+        while True:
+            segment = self.scheduler.next()
+            if segment is None:
+                break
+
+            glider, path, file_base, pair = segment
+            try:
+                self.publish_segment_pair(glider, path, file_base, pair)
+            except BaseException:
+                logger.exception(
+                    'Error processing pair {}'.format(file_base)
+                )
+
+    def stop(self):
+        """Stops publishing pairs once the current one is published
+        """
+        pending = len(self.scheduler)
+        if pending:
+            logger.warning('Stopping with {} pairs pending'.format(pending))
+        self.scheduler.stop()
+        if self.worker is not None:
+            self.worker.join()
+
+    def send(self, message):
+        """Sends a message to the ZMQ socket and in-process consumers
+        """
+        if self.socket is not None:
+            self.socket.send_json(message)
+        for consumer in self.consumers:
+            consumer(message)
+
+    def publish_columns(self, glider, set_timestamp, columns):
+        for consumer in self.consumers:
+            consumer({
+                'message_type': 'set_columns',
+                'glider': glider,
+                'start': set_timestamp.isoformat(),
+                'data': columns
+            })
+
+        if self.socket is None:
+            return
+
+        if self.block_size:
+            for block in columns.blocks(self.block_size):
+                self.socket.send_json({
+                    'message_type': 'set_block',
+                    'glider': glider,
+                    'start': set_timestamp.isoformat(),
+                    'data': block
+                })
+                time.sleep(0.01)
+        else:
+            self.publish_rows(glider, set_timestamp, columns.rows())
+
+    def publish_rows(self, glider, set_timestamp, rows):
+        for value in rows:
+            self.socket.send_json({
+                'message_type': 'set_data',
+                'glider': glider,
+                'start': set_timestamp.isoformat(),
+                'data': value
+            })
+            time.sleep(0.01)
+
+    def publishes_columns(self):
+        """Whether pairs need merged columns rather than merged rows
+
+        One set_data message per row for every sensor is published
+        straight from MergedGliderBDReader, since building columns
+        only to turn them back into rows is slower.
+        """
+        return bool(self.block_size or self.sensors or self.consumers)
+
+    def merge_pair(self, headers, flight_reader, science_reader):
+        """Merges the rows of a flight and science reader as columns
+        """
+        # Only keep the columns of projected sensors
+        keys = None
+        if self.sensors:
+            keys = [
+                header_key(header)
+                for header in project_headers(headers, self.sensors)
+            ]
+
+        # Convert each file's rows into per-sensor arrays once and merge
+        # the arrays on timestamp instead of merging row dictionaries
+        merged = merge_columns(
+            GliderColumns.from_rows(flight_reader, keys),
+            GliderColumns.from_rows(science_reader, keys)
+        )
+
+        # Rows are dropped only after the merge so equal timestamps
+        # still pair up as they would without a projection
+        if self.sensors:
+            merged = merged.drop_empty_rows()
+        return merged
+
     def publish_segment_pair(self, glider, path, file_base, pair):
         segment_id = int(file_base[file_base.rfind('-') + 1:file_base.find('.')])
 
@@ -65,9 +207,17 @@ class GliderFileProcessor(ProcessEvent):
 
         flight_reader = GliderBDReader([os.path.join(path, flight_file)])
         science_reader = GliderBDReader([os.path.join(path, science_file)])
-        merged_reader = MergedGliderBDReader(flight_reader, science_reader)
 
-        self.socket.send_json({
+        if self.publishes_columns():
+            headers = flight_reader.headers + science_reader.headers
+            merged = self.merge_pair(headers, flight_reader, science_reader)
+            if self.sensors:
+                headers = project_headers(headers, self.sensors)
+        else:
+            merged_reader = MergedGliderBDReader(flight_reader, science_reader)
+            headers = merged_reader.headers
+
+        self.send({
             'message_type': 'set_start',
             'start': set_timestamp.isoformat(),
             'flight_type': pair[0],
@@ -76,18 +226,14 @@ class GliderFileProcessor(ProcessEvent):
             'science_type': pair[1],
             'glider': glider,
             'segment': segment_id,
-            'headers': merged_reader.headers
+            'headers': headers
         })
 
-        for value in merged_reader:
-            self.socket.send_json({
-                'message_type': 'set_data',
-                'glider': glider,
-                'start': set_timestamp.isoformat(),
-                'data': value
-            })
-            time.sleep(0.01)
-        self.socket.send_json({
+        if self.publishes_columns():
+            self.publish_columns(glider, set_timestamp, merged)
+        else:
+            self.publish_rows(glider, set_timestamp, merged_reader)
+        self.send({
             'message_type': 'set_end',
             'glider': glider,
             'start': set_timestamp.isoformat(),
@@ -118,14 +264,9 @@ class GliderFileProcessor(ProcessEvent):
                     checkFile = event.name[:-3] + pair[0]
 
                 if checkFile in self.glider_data[glider_name]['files']:
-                    try:
-                        self.publish_segment_pair(
-                            glider_name, event.path, event.name[:-3], pair
-                        )
-                    except BaseException:
-                        logger.exception(
-                            'Error processing pair {}'.format(event.name[:-3])
-                        )
+                    self.schedule(
+                        glider_name, event.path, event.name[:-3], pair
+                    )
 
     def valid_extension(self, name):
         extension = name[name.rfind('.') + 1:]
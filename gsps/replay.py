@@ -0,0 +1,511 @@
+#!/usr/bin/env python
+
+# Records and replays the messages published by GSPS.
+#
+# gsps-record subscribes to a GSPS socket and writes every message with
+# the time it arrived to a gzipped JSON lines recording.  The first line
+# is a header, every other line is [seconds since start, message].
+#
+# gsps-replay publishes one or more recordings on a local socket at their
+# recorded pace, a multiple of it or as fast as possible.  Several
+# recordings are interleaved by time to simulate a fleet.  It can run the
+# gsps.nc message handlers on a monitor subscriber in a separate process
+# and report the dropped messages, lag and memory use of that subscriber.
+# Only the monitor's copy of each message is stamped for measuring lag.
+
+import os
+import sys
+import gzip
+import json
+import time
+import heapq
+import argparse
+import resource
+import multiprocessing
+from datetime import datetime
+
+import zmq
+import numpy as np
+
+import logging
+logging.captureWarnings(True)
+logger = logging.getLogger(__name__)
+
+RECORDING_FORMAT = 'gsps-recording'
+RECORDING_VERSION = 1
+
+MONITOR_HOST = 'tcp://127.0.0.1'
+
+
+def record(zmq_url, path, duration=None, count=None):
+    """Writes messages from a GSPS socket to a recording
+
+    Stops after duration seconds or count messages, whichever comes
+    first, or on KeyboardInterrupt.  Returns the number of messages.
+    """
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    socket.connect(zmq_url)
+    socket.setsockopt(zmq.SUBSCRIBE, b'')
+
+    recorded = 0
+    with gzip.open(path, 'wt') as f:
+        f.write(json.dumps({
+            'format': RECORDING_FORMAT,
+            'version': RECORDING_VERSION,
+            'zmq_url': zmq_url,
+            'recorded': datetime.utcnow().isoformat()
+        }) + '\n')
+
+        start = time.time()
+        try:
+            while count is None or recorded < count:
+                elapsed = time.time() - start
+                if duration is not None and elapsed >= duration:
+                    break
+                if socket.poll(1000) == 0:
+                    continue
+
+                message = socket.recv_json()
+                f.write(json.dumps([time.time() - start, message]) + '\n')
+                recorded += 1
+        except KeyboardInterrupt:
+            pass
+
+    socket.close()
+    return recorded
+
+
+def read_recording(path, index=0, rename_sets=False):
+    """Yields (offset, index, message) from a recording
+
+    Offsets are seconds since the first recorded message.  With
+    rename_sets, the recording index is appended to each message start
+    so sets from several copies of a recording stay apart.
+    """
+    with gzip.open(path, 'rt') as f:
+        header = json.loads(f.readline())
+        if header.get('format') != RECORDING_FORMAT:
+            raise ValueError('{} is not a GSPS recording'.format(path))
+
+        first = None
+        for line in f:
+            offset, message = json.loads(line)
+            if first is None:
+                first = offset
+            offset -= first
+            if rename_sets and 'start' in message:
+                message['start'] = '{}-r{}'.format(message['start'], index)
+            yield offset, index, message
+
+
+def interleave_recordings(paths):
+    """Merges recordings into one stream ordered by offset
+    """
+    rename_sets = len(paths) > 1
+    return heapq.merge(*[
+        read_recording(path, index, rename_sets)
+        for index, path in enumerate(paths)
+    ], key=lambda entry: entry[0])
+
+
+def process_rss(pid):
+    """Resident memory of a process in kB, or None if it is not running
+    """
+    try:
+        with open('/proc/{}/status'.format(pid), 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except (IOError, OSError):
+        return None
+    return None
+
+
+class ReplayStats(object):
+    """Counts and lag of the messages seen by the monitor subscriber
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.received = 0
+        self.undrained = 0
+        self.lags = []
+        self.monitored = False
+        self.peak_rss = None
+        self.subscriber_peak_rss = None
+        self.monitor_peak_rss = None
+
+    def sample_memory(self, pid=None, monitor_pid=None):
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        self.peak_rss = max(self.peak_rss or 0, rss)
+        if pid is not None:
+            rss = process_rss(pid)
+            if rss is not None:
+                self.subscriber_peak_rss = max(
+                    self.subscriber_peak_rss or 0, rss
+                )
+        if monitor_pid is not None:
+            rss = process_rss(monitor_pid)
+            if rss is not None:
+                self.monitor_peak_rss = max(self.monitor_peak_rss or 0, rss)
+
+    def report(self):
+        report = {
+            'sent': self.sent,
+            'peak_rss_kb': self.peak_rss
+        }
+        if self.subscriber_peak_rss is not None:
+            report['subscriber_peak_rss_kb'] = self.subscriber_peak_rss
+        if self.monitor_peak_rss is not None:
+            report['monitor_peak_rss_kb'] = self.monitor_peak_rss
+
+        # Drops are reported whenever a monitor ran, most of all when
+        # it received nothing.  Messages that reached the monitor but
+        # were still queued when it stopped are undrained, not dropped.
+        if self.monitored:
+            dropped = self.sent - self.received - self.undrained
+            report.update({
+                'received': self.received,
+                'undrained': self.undrained,
+                'dropped': dropped,
+                'drop_rate': float(dropped) / self.sent if self.sent else 0.0,
+                'lag_mean_s': None,
+                'lag_p95_s': None,
+                'lag_max_s': None
+            })
+            if self.lags:
+                lags = np.array(self.lags)
+                report.update({
+                    'lag_mean_s': float(lags.mean()),
+                    'lag_p95_s': float(np.percentile(lags, 95)),
+                    'lag_max_s': float(lags.max())
+                })
+        return report
+
+
+def monitor_messages(monitor_url, configs, hwm, ready, stopped, received,
+                     results):
+    """Subscribes to the stamped replay messages, running the gsps.nc
+    message handlers on them when configs are given
+
+    Runs in its own process so the handlers do not share the replayer's
+    GIL.  Counts messages in the shared `received` value.  Once stopped,
+    sends the lag of every message and the number of messages left
+    queued back on the `results` pipe.
+    """
+    handlers = {}
+    if configs is not None:
+        from gsps.nc import (
+            message_handlers,
+            start_profile_writers,
+            stop_profile_writers
+        )
+        handlers = message_handlers
+        start_profile_writers(configs)
+    sets = {}
+    lags = []
+
+    context = zmq.Context()
+    socket = context.socket(zmq.SUB)
+    if hwm is not None:
+        socket.setsockopt(zmq.RCVHWM, hwm)
+    socket.connect(monitor_url)
+    socket.setsockopt(zmq.SUBSCRIBE, b'')
+    ready.set()
+
+    while not stopped.is_set():
+        if socket.poll(100) == 0:
+            continue
+
+        message = socket.recv_json()
+        lags.append(time.time() - message.pop('replay')['sent'])
+        received.value += 1
+
+        message_type = message['message_type']
+        if message_type in handlers:
+            try:
+                handlers[message_type](configs, sets, message)
+            except BaseException:
+                logger.exception(
+                    'Error handling {} message'.format(message_type)
+                )
+
+    # Messages still queued when the drain deadline passed were
+    # delivered, just not handled in time
+    undrained = 0
+    while socket.poll(100):
+        socket.recv()
+        undrained += 1
+
+    socket.close(linger=0)
+    context.term()
+    if configs is not None:
+        stop_profile_writers(configs)
+
+    results.send((lags, undrained))
+    results.close()
+
+
+def start_monitor(context, configs=None, hwm=None):
+    """Binds the monitor socket and starts the monitor subscriber process
+
+    Returns the monitor state used by publish and stop_monitor.
+    """
+    socket = context.socket(zmq.PUB)
+    if hwm is not None:
+        socket.setsockopt(zmq.SNDHWM, hwm)
+    monitor_url = '{}:{}'.format(
+        MONITOR_HOST,
+        socket.bind_to_random_port(MONITOR_HOST)
+    )
+
+    # Spawned rather than forked from this process and its ZMQ threads
+    processes = multiprocessing.get_context('spawn')
+    monitor = {
+        'socket': socket,
+        'ready': processes.Event(),
+        'stopped': processes.Event(),
+        'received': processes.Value('l', 0, lock=False)
+    }
+    monitor['results'], results = processes.Pipe(duplex=False)
+    monitor['process'] = processes.Process(
+        target=monitor_messages,
+        args=(monitor_url, configs, hwm, monitor['ready'],
+              monitor['stopped'], monitor['received'], results)
+    )
+    monitor['process'].start()
+    return monitor
+
+
+def stop_monitor(monitor, stats):
+    """Stops the monitor subscriber and collects what it received
+    """
+    process = monitor['process']
+    monitor['stopped'].set()
+
+    # Read the results before joining so a large pipe write
+    # cannot block the monitor from exiting.  If the monitor dies
+    # first, its shared count still says what it received.
+    results = monitor['results']
+    while process.is_alive() or results.poll():
+        if results.poll(0.1):
+            stats.lags, stats.undrained = results.recv()
+            break
+    process.join()
+    stats.received = monitor['received'].value
+    if process.exitcode != 0:
+        logger.error('Monitor subscriber exited with {}'.format(
+            process.exitcode
+        ))
+    monitor['socket'].close()
+
+
+def replay(paths, zmq_url, speed=1.0, wait=1.0, drain=5.0,
+           monitor=False, configs=None, hwm=None, pid=None):
+    """Publishes recordings on a ZMQ socket
+
+    speed is a multiple of the recorded pace, 0 publishes as fast as
+    possible.  With monitor, a copy of every message stamped with a
+    sequence number and send time is published on a second socket and
+    read back by a subscriber in a separate process.  Messages on
+    zmq_url are sent as recorded.  Returns the ReplayStats.
+    """
+    context = zmq.Context()
+    socket = context.socket(zmq.PUB)
+    if hwm is not None:
+        socket.setsockopt(zmq.SNDHWM, hwm)
+    socket.bind(zmq_url)
+
+    stats = ReplayStats()
+    stats.monitored = monitor
+    monitor_state = None
+    monitor_pid = None
+    try:
+        if monitor:
+            monitor_state = start_monitor(context, configs, hwm)
+            monitor_pid = monitor_state['process'].pid
+            while not monitor_state['ready'].wait(0.1):
+                if not monitor_state['process'].is_alive():
+                    raise RuntimeError('Monitor subscriber failed to start')
+
+        # Give subscribers time to connect before anything is published
+        time.sleep(wait)
+
+        start = time.time()
+        for offset, index, message in interleave_recordings(paths):
+            if speed > 0:
+                delay = start + offset / speed - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+
+            socket.send_json(message)
+            if monitor_state is not None:
+                stamped = dict(message)
+                stamped['replay'] = {
+                    'recording': index,
+                    'sequence': stats.sent,
+                    'sent': time.time()
+                }
+                monitor_state['socket'].send_json(stamped)
+            stats.sent += 1
+
+            if stats.sent % 1000 == 0:
+                stats.sample_memory(pid, monitor_pid)
+
+        if monitor_state is not None:
+            deadline = time.time() + drain
+            received = monitor_state['received']
+            while received.value < stats.sent and time.time() < deadline:
+                stats.sample_memory(pid, monitor_pid)
+                time.sleep(0.1)
+            stats.sample_memory(pid, monitor_pid)
+    finally:
+        if monitor_state is not None:
+            stop_monitor(monitor_state, stats)
+        socket.close()
+
+    stats.sample_memory(pid)
+    return stats
+
+
+def record_main():
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+    logging.getLogger('py.warnings').setLevel(logging.ERROR)
+
+    parser = argparse.ArgumentParser(
+        description="Records the messages published on a GSPS socket."
+    )
+    parser.add_argument(
+        "output",
+        help="Recording file to write, e.g. usf-bass.gsps.gz"
+    )
+    parser.add_argument(
+        "--zmq_url",
+        help='Port to listen for ZMQ GSPS messages. '
+             'Default is "tcp://127.0.0.1:44444".',
+        default=os.environ.get('ZMQ_URL', 'tcp://127.0.0.1:44444')
+    )
+    parser.add_argument(
+        "--duration",
+        help="Seconds to record for.  Default is until interrupted.",
+        type=float
+    )
+    parser.add_argument(
+        "--count",
+        help="Number of messages to record.  Default is until interrupted.",
+        type=int
+    )
+
+    args = parser.parse_args()
+
+    logger.info("Recording {} to {}".format(args.zmq_url, args.output))
+    recorded = record(args.zmq_url, args.output, args.duration, args.count)
+    logger.info("Recorded {} messages".format(recorded))
+    return 0
+
+
+def replay_main():
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.StreamHandler())
+    logging.getLogger('py.warnings').setLevel(logging.ERROR)
+
+    parser = argparse.ArgumentParser(
+        description="Publishes GSPS recordings on a ZMQ socket and reports "
+                    "how a subscriber keeps up."
+    )
+    parser.add_argument(
+        "recordings",
+        help="Recordings to replay.  Several are interleaved by time.",
+        nargs='+'
+    )
+    parser.add_argument(
+        "--zmq_url",
+        help='Port to publish ZMQ messages on. '
+             'Default is "tcp://127.0.0.1:44444".',
+        default=os.environ.get('ZMQ_URL', 'tcp://127.0.0.1:44444')
+    )
+    parser.add_argument(
+        "--speed",
+        help="Multiple of the recorded pace.  0 publishes as fast as "
+             "possible.  Default is 1.",
+        type=float,
+        default=1.0
+    )
+    parser.add_argument(
+        "--wait",
+        help="Seconds to wait for subscribers before publishing.  "
+             "Default is 1.",
+        type=float,
+        default=1.0
+    )
+    parser.add_argument(
+        "--monitor",
+        help="Read the replayed messages back with a subscriber in a "
+             "separate process and report dropped messages and lag.",
+        action='store_true'
+    )
+    parser.add_argument(
+        "--configs",
+        help="Run the gsps2nc message handlers in the monitor subscriber "
+             "with the JSON configuration files in this folder.",
+    )
+    parser.add_argument(
+        "--output",
+        help="Where the monitor subscriber places generated netCDF files.",
+        default=os.environ.get('GSPS2NC_OUTPUT')
+    )
+    parser.add_argument(
+        "--hwm",
+        help="ZMQ high water mark for the publisher and monitor subscriber.",
+        type=int
+    )
+    parser.add_argument(
+        "--drain",
+        help="Seconds to wait for the monitor subscriber to catch up.  "
+             "Default is 5.",
+        type=float,
+        default=5.0
+    )
+    parser.add_argument(
+        "--pid",
+        help="Process ID of an external subscriber, such as gsps2nc, "
+             "whose peak memory to report.",
+        type=int
+    )
+
+    args = parser.parse_args()
+
+    configs = None
+    if args.configs:
+        if not args.output:
+            logger.error("Please provide an --output argument or set the "
+                         "GSPS2NC_OUTPUT environmental variable")
+            sys.exit(parser.print_usage())
+
+        from gsps.nc import load_configs
+        configs = load_configs(args.configs.rstrip('/'))
+        configs['output_directory'] = args.output.rstrip('/')
+
+    logger.info("Replaying {} to {}".format(
+        ', '.join(args.recordings),
+        args.zmq_url)
+    )
+    stats = replay(
+        args.recordings,
+        args.zmq_url,
+        speed=args.speed,
+        wait=args.wait,
+        drain=args.drain,
+        monitor=args.monitor or configs is not None,
+        configs=configs,
+        hwm=args.hwm,
+        pid=args.pid
+    )
+
+    print(json.dumps(stats.report(), indent=2))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(replay_main())
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+# Schedules flight/science segment pairs waiting to be published
+#
+# Each glider has its own queue of pending pairs and gliders take turns
+# in round-robin order, so one glider dumping a long backlog does not
+# hold up real-time segments from the others.  Within a glider queue
+# the policy decides which pair goes next:
+# * fifo: pairs are published in the order they were found
+# * newest: a segment newer than anything already published for the
+#   glider goes first, then the backlog is published in order
+
+import re
+from collections import deque
+from threading import Condition
+
+import logging
+logger = logging.getLogger(__name__)
+
+SCHEDULE_POLICIES = ['fifo', 'newest']
+
+SEGMENT_PATTERN = re.compile(r'(\d+)-(\d+)-(\d+)-(\d+)\.?$')
+
+
+def segment_order(file_base):
+    """Sort key for a segment file base such as usf-bass-2014-048-1-2.
+
+    Orders by year, day, mission and segment.  Names that do not follow
+    the convention sort before any that do.
+    """
+    match = SEGMENT_PATTERN.search(file_base)
+    if match is None:
+        return ()
+    return tuple(int(part) for part in match.groups())
+
+
+class SegmentScheduler(object):
+    """Per-glider queues of pending segment pairs with round-robin fairness
+    """
+
+    def __init__(self, policy='newest'):
+        if policy not in SCHEDULE_POLICIES:
+            raise ValueError('Unknown schedule policy: {}'.format(policy))
+
+        self.policy = policy
+        self.pending = {}
+        self.latest = {}
+        self.turns = deque()
+        self.stopped = False
+        self.condition = Condition()
+
+    def __len__(self):
+        with self.condition:
+            return sum(len(queue) for queue in self.pending.values())
+
+    def add(self, glider, path, file_base, pair):
+        """Queues a segment pair.  Pairs already waiting are ignored.
+        """
+        segment = (glider, path, file_base, pair)
+        with self.condition:
+            queue = self.pending.setdefault(glider, [])
+            if segment in queue:
+                return False
+
+            queue.append(segment)
+            if glider not in self.turns:
+                self.turns.append(glider)
+            self.condition.notify()
+            return True
+
+    def __select(self, glider):
+        queue = self.pending[glider]
+        index = 0
+        if self.policy == 'newest':
+            newest = max(
+                range(len(queue)),
+                key=lambda i: segment_order(queue[i][2])
+            )
+            newest_order = segment_order(queue[newest][2])
+            if glider not in self.latest or newest_order > self.latest[glider]:
+                index = newest
+
+        segment = queue.pop(index)
+        order = segment_order(segment[2])
+        if glider not in self.latest or order > self.latest[glider]:
+            self.latest[glider] = order
+        return segment
+
+    def next(self, timeout=None):
+        """Returns the next (glider, path, file_base, pair) to publish
+
+        Blocks until a pair is pending.  Returns None once stopped or
+        when the timeout expires.
+        """
+        with self.condition:
+            while not self.turns and not self.stopped:
+                if not self.condition.wait(timeout):
+                    return None
+            if self.stopped:
+                return None
+
+            glider = self.turns.popleft()
+            segment = self.__select(glider)
+            if self.pending[glider]:
+                self.turns.append(glider)
+            else:
+                del self.pending[glider]
+            return segment
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.condition.notify_all()
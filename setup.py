@@ -33,7 +33,11 @@ setup(
     entry_points = {
         'console_scripts': [
             'gsps-cli=gsps.cli:main',
-            'gsps2nc=gsps.nc.cli:main'
+            'gsps2nc=gsps.nc.cli:main',
+            'gsps-inproc=gsps.inproc:main',
+            'gsps2nc-catalog=gsps.nc.catalog_cli:main',
+            'gsps-record=gsps.replay:record_main',
+            'gsps-replay=gsps.replay:replay_main'
         ],
     },
     classifiers=[
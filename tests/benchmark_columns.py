@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+
+# Compares the row-wise and columnar paths of a flight/science pair:
+# merging the decoded rows, JSON encoding the set_data or set_block
+# messages and decoding them again in the subscriber.  Decoding the
+# files is common to both paths and the 10ms sleep the publisher takes
+# after every message is left out.
+#
+# With gutils installed the row-wise path is MergedGliderBDReader over
+# the given flight and science files.  Otherwise synthetic sparse and
+# dense pairs are merged with the row merge from tests/test_columns.py.
+#
+#   python tests/benchmark_columns.py [flight.dbd science.ebd]
+
+import os
+import sys
+import json
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from gsps.columns import GliderColumns, merge_columns  # noqa
+
+BLOCK_SIZE = 500
+
+
+class ListReader(object):
+
+    def __init__(self, headers, rows):
+        self.headers = headers
+        self.rows = iter(rows)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.rows)
+
+
+def synthetic_rows(prefix, sensors, count, density, start, step):
+    names = ['{}_sensor_{}-nodim'.format(prefix, i) for i in range(sensors)]
+    rows = []
+    for i in range(count):
+        row = {'timestamp': start + i * step}
+        for name in names:
+            if density >= 1 or random.random() < density:
+                row[name] = random.random()
+        rows.append(row)
+    return rows
+
+
+def timed(function):
+    started = time.time()
+    result = function()
+    return time.time() - started, result
+
+
+def publish_rows(rows):
+    return [
+        json.dumps({'message_type': 'set_data', 'data': row})
+        for row in rows
+    ]
+
+
+def publish_blocks(blocks):
+    return [
+        json.dumps({'message_type': 'set_block', 'data': block})
+        for block in blocks
+    ]
+
+
+def receive_rows(messages):
+    return [json.loads(message)['data'] for message in messages]
+
+
+def receive_blocks(messages):
+    return GliderColumns.from_blocks(
+        json.loads(message)['data'] for message in messages
+    )
+
+
+def report(label, seconds, baseline):
+    print('  {:<36}{:6.2f}s ({:.1f}x)'.format(
+        label, seconds, baseline / seconds))
+
+
+def benchmark(name, flight_rows, science_rows, merged_rows):
+    row_time, row_messages = timed(lambda: publish_rows(merged_rows()))
+    row_receive_time, _ = timed(lambda: receive_rows(row_messages))
+
+    def columnar():
+        return merge_columns(
+            GliderColumns.from_rows(flight_rows),
+            GliderColumns.from_rows(science_rows)
+        )
+
+    merge_time, merged = timed(columnar)
+    rows_time, _ = timed(lambda: publish_rows(merged.rows()))
+    blocks_time, block_messages = timed(
+        lambda: publish_blocks(merged.blocks(BLOCK_SIZE))
+    )
+    block_receive_time, _ = timed(lambda: receive_blocks(block_messages))
+
+    print('{}: {} merged rows'.format(name, len(merged)))
+    print('  publish')
+    report('row merge + set_data', row_time, row_time)
+    report('columnar merge', merge_time, row_time)
+    report('columnar + set_data (projected)', merge_time + rows_time,
+           row_time)
+    report('columnar + set_block({})'.format(BLOCK_SIZE),
+           merge_time + blocks_time, row_time)
+    print('  subscribe')
+    report('set_data rows', row_receive_time, row_receive_time)
+    report('set_block columns', block_receive_time, row_receive_time)
+    print('  {} set_data messages ({:.1f} MB) vs {} set_block ({:.1f} MB)'.format(
+        len(row_messages), sum(map(len, row_messages)) / 1e6,
+        len(block_messages), sum(map(len, block_messages)) / 1e6))
+
+
+def main():
+    if len(sys.argv) == 3:
+        from gutils.gbdr import GliderBDReader, MergedGliderBDReader
+
+        flight_reader = GliderBDReader([sys.argv[1]])
+        science_reader = GliderBDReader([sys.argv[2]])
+        flight_rows = list(flight_reader)
+        science_rows = list(science_reader)
+
+        benchmark(
+            'MergedGliderBDReader',
+            flight_rows,
+            science_rows,
+            lambda: MergedGliderBDReader(
+                ListReader(flight_reader.headers, flight_rows),
+                ListReader(science_reader.headers, science_rows)
+            )
+        )
+        return 0
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from test_columns import merge_rows
+
+    random.seed(0)
+    pairs = [
+        ('sparse', 400, 100, 20000, 0.02),
+        ('dense', 300, 60, 5000, 1.0)
+    ]
+    for name, flight_sensors, science_sensors, count, density in pairs:
+        flight_rows = synthetic_rows(
+            'm', flight_sensors, count, density, 0.0, 4.0
+        )
+        science_rows = synthetic_rows(
+            'sci', science_sensors, count, density, 1.0, 4.0
+        )
+        benchmark(
+            name,
+            flight_rows,
+            science_rows,
+            lambda: merge_rows(flight_rows, science_rows)
+        )
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+# Records the flight, science and merged rows of the sample
+# usf-bass-2014-048-1-0 sbd/tbd pair as a test fixture.
+#
+# With gutils installed the rows come straight from GliderBDReader and
+# MergedGliderBDReader.  Otherwise the files are decoded with dbdreader
+# into rows keyed the same way, one per cycle with the sensors updated
+# in that cycle, and merged row by row on timestamp.
+
+import os
+import sys
+import gzip
+import json
+
+RESOURCES = os.path.dirname(os.path.abspath(__file__))
+DATA_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(RESOURCES)),
+    'gsps-example',
+    'data',
+    'usf-bass'
+)
+FLIGHT_PATH = os.path.join(DATA_PATH, 'usf-bass-2014-048-1-0.sbd')
+SCIENCE_PATH = os.path.join(DATA_PATH, 'usf-bass-2014-048-1-0.tbd')
+FIXTURE_PATH = os.path.join(
+    RESOURCES,
+    'usf-bass',
+    'usf-bass-2014-048-1-0.rows.json.gz'
+)
+
+
+def gutils_rows():
+    from gutils.gbdr import GliderBDReader, MergedGliderBDReader
+
+    flight = list(GliderBDReader([FLIGHT_PATH]))
+    science = list(GliderBDReader([SCIENCE_PATH]))
+    merged = list(MergedGliderBDReader(
+        GliderBDReader([FLIGHT_PATH]),
+        GliderBDReader([SCIENCE_PATH])
+    ))
+    return 'gutils.gbdr', flight, science, merged
+
+
+def dbdreader_file_rows(path):
+    import dbdreader
+
+    dbd = dbdreader.DBD(path)
+    try:
+        rows = {}
+        for name in dbd.parameterNames:
+            times, values = dbd.get(name, decimalLatLon=False)
+            key = '{}-{}'.format(name, dbd.parameterUnits[name])
+            for timestamp, value in zip(times.tolist(), values.tolist()):
+                row = rows.setdefault(timestamp, {'timestamp': timestamp})
+                row[key] = value
+    finally:
+        dbd.close()
+
+    return [rows[timestamp] for timestamp in sorted(rows)]
+
+
+def dbdreader_rows():
+    flight = dbdreader_file_rows(FLIGHT_PATH)
+    science = dbdreader_file_rows(SCIENCE_PATH)
+
+    merged = []
+    i = 0
+    j = 0
+    while i < len(flight) or j < len(science):
+        if j >= len(science) or (
+                i < len(flight) and
+                flight[i]['timestamp'] < science[j]['timestamp']):
+            merged.append(dict(flight[i]))
+            i += 1
+        elif i >= len(flight) or (
+                science[j]['timestamp'] < flight[i]['timestamp']):
+            merged.append(dict(science[j]))
+            j += 1
+        else:
+            row = dict(flight[i])
+            row.update(science[j])
+            merged.append(row)
+            i += 1
+            j += 1
+
+    return 'dbdreader', flight, science, merged
+
+
+def main():
+    try:
+        source, flight, science, merged = gutils_rows()
+    except ImportError:
+        source, flight, science, merged = dbdreader_rows()
+
+    with gzip.open(FIXTURE_PATH, 'wt') as f:
+        json.dump({
+            'source': source,
+            'flight': flight,
+            'science': science,
+            'merged': merged
+        }, f)
+
+    print('Recorded {} merged rows from {} to {}'.format(
+        len(merged), source, FIXTURE_PATH
+    ))
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
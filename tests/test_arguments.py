@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+import os
+import json
+import argparse
+import tempfile
+import unittest
+
+from gsps.arguments import (
+    add_watcher_arguments,
+    add_writer_arguments,
+    env_flag,
+    processor_options,
+    strip_trailing_slash
+)
+
+
+class TestArguments(unittest.TestCase):
+
+    def test_strip_trailing_slash(self):
+        assert strip_trailing_slash('/data/') == '/data'
+        assert strip_trailing_slash('/data') == '/data'
+
+    def test_processor_options(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.json') as f:
+            json.dump(['m_depth', 'sci_water_temp-degc'], f)
+            f.flush()
+
+            parser = argparse.ArgumentParser()
+            add_watcher_arguments(parser)
+            add_writer_arguments(parser)
+            args = parser.parse_args([
+                '-d', '/data/',
+                '--block_size', '500',
+                '--schedule_policy', 'fifo',
+                '--sensors', f.name,
+                '--output', '/output/'
+            ])
+            options = processor_options(parser, args)
+
+        assert options == {
+            'block_size': 500,
+            'sensors': ['m_depth', 'sci_water_temp-degc'],
+            'schedule_policy': 'fifo'
+        }
+        assert args.profile_workers == 1
+
+    def test_processor_options_need_data_path(self):
+        parser = argparse.ArgumentParser()
+        add_watcher_arguments(parser)
+        args = parser.parse_args([])
+        args.data_path = None
+        with self.assertRaises(SystemExit):
+            processor_options(parser, args)
+
+    def test_env_flag(self):
+        for value, expected in [('1', True), ('true', True), ('Yes', True),
+                                ('0', False), ('false', False), ('', False)]:
+            os.environ['GSPS_TEST_FLAG'] = value
+            try:
+                assert env_flag('GSPS_TEST_FLAG') is expected
+            finally:
+                del os.environ['GSPS_TEST_FLAG']
+        assert env_flag('GSPS_TEST_FLAG') is False
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import os
+import shutil
+import tempfile
+import unittest
+
+from netCDF4 import default_fillvals as NC_FILL_VALUES
+
+from gsps.nc.catalog import (
+    catalog_entry,
+    query_files,
+    record_file
+)
+from gsps.nc.catalog_cli import parse_time
+
+
+class FakeDataset(object):
+
+    def __init__(self, segment, times, lats, lons):
+        self.glider = 'usf-bass'
+        self.segment = segment
+        self.flight_file = 'usf-bass-2014-048-%d-0.sbd' % segment
+        self.science_file = 'usf-bass-2014-048-%d-0.tbd' % segment
+        self.times = times
+        self.data_by_type = {
+            'lat-lat': lats,
+            'lon-lon': lons,
+            'm_depth-m': [1.0, NC_FILL_VALUES['f8'], 20.0]
+        }
+
+
+class TestCatalog(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'catalog.sqlite')
+
+        record_file(self.path, catalog_entry(
+            FakeDataset(0, [100.0, 200.0, 300.0],
+                        [27.0, float('nan'), 27.5], [-83.0, -83.1, -83.2]),
+            os.path.join(self.directory, 'segment0.nc')
+        ))
+        record_file(self.path, catalog_entry(
+            FakeDataset(1, [400.0, 500.0, 600.0],
+                        [28.0, 28.1, 28.2], [-84.0, -84.1, -84.2]),
+            os.path.join(self.directory, 'segment1.nc')
+        ))
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_entry(self):
+        entries = query_files(self.path)
+        assert len(entries) == 2
+
+        entry = entries[0]
+        assert entry['segment'] == 0
+        assert entry['rows'] == 3
+        assert entry['lat_min'] == 27.0
+        assert entry['lat_max'] == 27.5
+        assert entry['depth_max'] == 20.0
+        assert entry['flight_file'] == 'usf-bass-2014-048-0-0.sbd'
+
+    def test_rerecord_replaces(self):
+        record_file(self.path, catalog_entry(
+            FakeDataset(0, [100.0, 200.0, 350.0],
+                        [27.0, 27.2, 27.5], [-83.0, -83.1, -83.2]),
+            os.path.join(self.directory, 'segment0.nc')
+        ))
+        entries = query_files(self.path)
+        assert len(entries) == 2
+        assert entries[0]['time_max'] == 350.0
+
+    def test_query_time(self):
+        entries = query_files(self.path, start=250, end=450)
+        assert [e['segment'] for e in entries] == [0, 1]
+
+        entries = query_files(self.path, start=350)
+        assert [e['segment'] for e in entries] == [1]
+
+    def test_query_bbox(self):
+        entries = query_files(self.path, bbox=(-83.5, 26.5, -82.5, 27.6))
+        assert [e['segment'] for e in entries] == [0]
+
+        entries = query_files(self.path, bbox=(-85, 26, -82, 29), glider='other')
+        assert entries == []
+
+    def test_parse_time(self):
+        assert parse_time('86400') == 86400.0
+        assert parse_time('1970-01-02') == 86400
+        assert parse_time('1970-01-02T00:00:10Z') == 86410
@@ -0,0 +1,267 @@
+#!/usr/bin/env python
+
+import os
+import gzip
+import json
+import math
+import unittest
+
+from gsps.columns import (
+    GliderColumns,
+    block_rows,
+    merge_columns,
+    project_headers
+)
+
+
+def merge_rows(flight_rows, science_rows):
+    """Reference row-by-row merge on timestamp"""
+    merged = []
+    i = 0
+    j = 0
+    while i < len(flight_rows) or j < len(science_rows):
+        if j >= len(science_rows) or (
+                i < len(flight_rows) and
+                flight_rows[i]['timestamp'] < science_rows[j]['timestamp']):
+            merged.append(dict(flight_rows[i]))
+            i += 1
+        elif i >= len(flight_rows) or (
+                science_rows[j]['timestamp'] < flight_rows[i]['timestamp']):
+            merged.append(dict(science_rows[j]))
+            j += 1
+        else:
+            row = dict(flight_rows[i])
+            row.update(science_rows[j])
+            merged.append(row)
+            i += 1
+            j += 1
+    return merged
+
+
+FLIGHT_ROWS = [
+    {'timestamp': 10.0, 'm_depth-m': 1.5, 'm_gps_lat-lat': 2730.1},
+    {'timestamp': 11.0, 'm_depth-m': 2.5},
+    {'timestamp': 11.0, 'm_depth-m': 3.0},
+    {'timestamp': 14.0, 'm_depth-m': 4.5, 'm_gps_lat-lat': 2730.2},
+    {'timestamp': 20.0, 'm_depth-m': 5.5},
+]
+
+SCIENCE_ROWS = [
+    {'timestamp': 9.0, 'sci_water_temp-degc': 20.1},
+    {'timestamp': 11.0, 'sci_water_temp-degc': 20.2},
+    {'timestamp': 12.0, 'sci_water_temp-degc': 20.3, 'sci_count-nodim': 3},
+    {'timestamp': 14.0, 'sci_count-nodim': 4},
+    {'timestamp': 25.0, 'sci_water_temp-degc': 20.4},
+]
+
+
+class TestGliderColumns(unittest.TestCase):
+
+    def test_from_rows_round_trip(self):
+        columns = GliderColumns.from_rows(FLIGHT_ROWS)
+        assert len(columns) == len(FLIGHT_ROWS)
+        assert columns.present('m_gps_lat-lat').tolist() == [
+            True, False, False, True, False
+        ]
+        assert columns.column('m_gps_lat-lat', -1.0).tolist() == [
+            2730.1, -1.0, -1.0, 2730.2, -1.0
+        ]
+        assert list(columns.rows()) == FLIGHT_ROWS
+        assert list(columns.rows(chunk_size=2)) == FLIGHT_ROWS
+
+    def test_blocks_round_trip(self):
+        columns = GliderColumns.from_rows(FLIGHT_ROWS)
+        blocks = [json.loads(json.dumps(block)) for block in columns.blocks(2)]
+        assert len(blocks) == 3
+        assert [block['length'] for block in blocks] == [2, 2, 1]
+        group = blocks[0]['groups'][0]
+        assert group['dtype'] == '<f8'
+        assert group['keys'] == ['timestamp', 'm_depth-m', 'm_gps_lat-lat']
+        assert group['counts'] == [2, 2, 1]
+        assert blocks[2]['groups'][0]['keys'] == ['timestamp', 'm_depth-m']
+
+        rows = []
+        for block in blocks:
+            rows.extend(block_rows(block))
+        assert rows == FLIGHT_ROWS
+
+        rebuilt = GliderColumns.from_blocks(blocks)
+        assert len(rebuilt) == len(columns)
+        assert list(rebuilt.rows()) == FLIGHT_ROWS
+
+    def test_blocks_keep_types(self):
+        columns = GliderColumns.from_rows(SCIENCE_ROWS)
+        rows = []
+        for block in columns.blocks(3):
+            rows.extend(block_rows(json.loads(json.dumps(block))))
+        assert rows == SCIENCE_ROWS
+        assert type(rows[2]['sci_count-nodim']) is int
+
+    def test_merge_matches_row_merge(self):
+        merged = merge_columns(
+            GliderColumns.from_rows(FLIGHT_ROWS),
+            GliderColumns.from_rows(SCIENCE_ROWS)
+        )
+        expected = merge_rows(FLIGHT_ROWS, SCIENCE_ROWS)
+        rows = list(merged.rows())
+        assert rows == expected
+        assert type(rows[4]['sci_count-nodim']) is int
+
+    def test_merge_unsorted_matches_row_merge(self):
+        flight_rows = list(reversed(FLIGHT_ROWS))
+        merged = merge_columns(
+            GliderColumns.from_rows(flight_rows),
+            GliderColumns.from_rows(SCIENCE_ROWS)
+        )
+        assert list(merged.rows()) == merge_rows(flight_rows, SCIENCE_ROWS)
+
+    def test_merge_empty_science(self):
+        merged = merge_columns(
+            GliderColumns.from_rows(FLIGHT_ROWS),
+            GliderColumns.from_rows([])
+        )
+        assert list(merged.rows()) == FLIGHT_ROWS
+
+    def test_from_rows_keys(self):
+        columns = GliderColumns.from_rows(
+            FLIGHT_ROWS, ['m_gps_lat-lat', 'm_unknown-nodim']
+        )
+        assert columns.keys == ['timestamp', 'm_gps_lat-lat']
+        assert len(columns) == len(FLIGHT_ROWS)
+        assert list(columns.rows())[:2] == [
+            {'timestamp': 10.0, 'm_gps_lat-lat': 2730.1},
+            {'timestamp': 11.0}
+        ]
+
+    def test_drop_empty_rows(self):
+        keys = ['m_gps_lat-lat', 'sci_count-nodim']
+        merged = merge_columns(
+            GliderColumns.from_rows(FLIGHT_ROWS, keys),
+            GliderColumns.from_rows(SCIENCE_ROWS, keys)
+        )
+        dropped = merged.drop_empty_rows()
+        assert list(dropped.rows()) == [
+            {'timestamp': 10.0, 'm_gps_lat-lat': 2730.1},
+            {'timestamp': 12.0, 'sci_count-nodim': 3},
+            {'timestamp': 14.0, 'm_gps_lat-lat': 2730.2, 'sci_count-nodim': 4}
+        ]
+        assert dropped.data['sci_count-nodim'] is merged.data['sci_count-nodim']
+
+    def test_project_headers(self):
+        headers = [
+            {'name': 'm_depth', 'units': 'm'},
+            {'name': 'm_gps_lat', 'units': 'lat'},
+            {'name': 'sci_water_temp', 'units': 'degc'}
+        ]
+        projected = project_headers(headers, ['m_depth', 'sci_water_temp-degc'])
+        assert projected == [headers[0], headers[2]]
+
+
+def snap_timestamps(rows, seconds):
+    """Copies of rows with timestamps floored to a multiple of seconds,
+    giving equal timestamps within and across files in sorted order
+    """
+    snapped = []
+    for row in rows:
+        row = dict(row)
+        row['timestamp'] = math.floor(row['timestamp'] / seconds) * seconds
+        snapped.append(row)
+    return snapped
+
+
+class TestRecordedSampleRows(unittest.TestCase):
+    """Checks the columnar merge on the recorded rows of the sample
+    usf-bass-2014-048-1-0 pair against the reference row merge above
+
+    Unless the fixture was recorded with gutils, these rows come from
+    dbdreader and are not MergedGliderBDReader output.
+    """
+
+    def setUp(self):
+        # Recorded by tests/resources/record_merged_rows.py
+        fixture_path = os.path.join(
+            os.path.dirname(__file__),
+            'resources',
+            'usf-bass',
+            'usf-bass-2014-048-1-0.rows.json.gz'
+        )
+        with gzip.open(fixture_path, 'rt') as f:
+            self.fixture = json.load(f)
+        self.flight = self.fixture['flight']
+        self.science = self.fixture['science']
+
+    def test_round_trip(self):
+        assert list(GliderColumns.from_rows(self.flight).rows()) == self.flight
+        assert list(GliderColumns.from_rows(self.science).rows()) == (
+            self.science
+        )
+
+    def test_merge_matches_row_merge(self):
+        merged = merge_columns(
+            GliderColumns.from_rows(self.flight),
+            GliderColumns.from_rows(self.science)
+        )
+        expected = merge_rows(self.flight, self.science)
+        assert list(merged.rows(chunk_size=100)) == expected
+
+        rows = []
+        for block in merged.blocks(64):
+            rows.extend(block_rows(json.loads(json.dumps(block))))
+        assert rows == expected
+
+    def test_duplicate_timestamps_match_row_merge(self):
+        flight = snap_timestamps(self.flight, 60)
+        science = snap_timestamps(self.science, 60)
+
+        # Equal timestamps within each file and across the two files
+        flight_times = [row['timestamp'] for row in flight]
+        science_times = [row['timestamp'] for row in science]
+        assert len(set(flight_times)) < len(flight_times)
+        assert len(set(science_times)) < len(science_times)
+        assert set(flight_times) & set(science_times)
+
+        merged = merge_columns(
+            GliderColumns.from_rows(flight),
+            GliderColumns.from_rows(science)
+        )
+        assert list(merged.rows()) == merge_rows(flight, science)
+
+    def test_merge_matches_recorded_reader_rows(self):
+        if self.fixture['source'] != 'gutils.gbdr':
+            raise unittest.SkipTest(
+                'Fixture was not recorded from MergedGliderBDReader'
+            )
+
+        merged = merge_columns(
+            GliderColumns.from_rows(self.flight),
+            GliderColumns.from_rows(self.science)
+        )
+        assert list(merged.rows()) == self.fixture['merged']
+
+
+class TestMergedGliderBDReader(unittest.TestCase):
+
+    def test_merge_matches_reader(self):
+        try:
+            from gutils.gbdr import GliderBDReader, MergedGliderBDReader
+        except ImportError:
+            raise unittest.SkipTest('gutils.gbdr is not available')
+
+        data_path = os.path.join(
+            os.path.dirname(os.path.dirname(__file__)),
+            'gsps-example',
+            'data',
+            'usf-bass'
+        )
+        flight_path = os.path.join(data_path, 'usf-bass-2014-048-1-0.sbd')
+        science_path = os.path.join(data_path, 'usf-bass-2014-048-1-0.tbd')
+
+        expected = list(MergedGliderBDReader(
+            GliderBDReader([flight_path]),
+            GliderBDReader([science_path])
+        ))
+        merged = merge_columns(
+            GliderColumns.from_rows(GliderBDReader([flight_path])),
+            GliderColumns.from_rows(GliderBDReader([science_path]))
+        )
+        assert list(merged.rows()) == expected
@@ -1,22 +1,335 @@
 #!/usr/bin/env python
 
 import os
+import gzip
+import json
+import pickle
+import shutil
+import tempfile
 import unittest
 
-from gsps.nc import load_configs
+import numpy as np
+from netCDF4 import default_fillvals as NC_FILL_VALUES
+
+from gsps.columns import GliderColumns
+from gsps.nc import (
+    GliderDataset,
+    GliderProfile,
+    in_profile,
+    load_configs,
+    message_handlers,
+    profile_slices,
+    set_length,
+    start_profile_writers,
+    stop_profile_writers,
+    write_netcdf
+)
+from gsps.nc.catalog import catalog_path, query_files
+
+
+RESOURCES_PATH = os.path.join(os.path.dirname(__file__), 'resources')
 
 
 class TestLoadConfigs(unittest.TestCase):
 
     def test_load_config(self):
-        test_path = os.path.join(
-            os.path.dirname(__file__),
-            'resources'
-        )
-        configs = load_configs(test_path)
+        configs = load_configs(RESOURCES_PATH)
 
         assert 'usf-bass' in configs
 
         assert 'global_attributes' in configs['usf-bass']
         assert 'deployment' in configs['usf-bass']
         assert 'instruments' in configs['usf-bass']
+
+
+class TestSetColumns(unittest.TestCase):
+
+    def test_set_columns(self):
+        sets = {}
+        message = {
+            'message_type': 'set_start',
+            'glider': 'usf-bass',
+            'start': '2014-02-17T00:00:00',
+            'segment': 0,
+            'headers': [{'name': 'm_depth', 'units': 'm'}]
+        }
+        message_handlers['set_start']({}, sets, message)
+
+        columns = GliderColumns.from_rows([
+            {'timestamp': 10.0, 'm_depth-m': 1.5},
+            {'timestamp': 11.0}
+        ])
+        message_handlers['set_columns']({}, sets, {
+            'message_type': 'set_columns',
+            'glider': 'usf-bass',
+            'start': '2014-02-17T00:00:00',
+            'data': columns
+        })
+
+        dataset = sets['usf-bass-2014-02-17T00:00:00']
+        assert dataset['headers'] == ['m_depth-m']
+        assert dataset['columns'] is columns
+        assert set_length(dataset) == 2
+
+
+def sample_rows():
+    """Merged rows of the usf-bass-2014-048-1-0 sample pair, recorded by
+    tests/resources/record_merged_rows.py
+    """
+    fixture_path = os.path.join(
+        os.path.dirname(__file__),
+        'resources',
+        'usf-bass',
+        'usf-bass-2014-048-1-0.rows.json.gz'
+    )
+    with gzip.open(fixture_path, 'rt') as f:
+        return json.load(f)['merged']
+
+
+def sample_headers(rows):
+    keys = set()
+    for row in rows:
+        keys.update(row)
+    keys.discard('timestamp')
+    return sorted(keys)
+
+
+class TestParseColumns(unittest.TestCase):
+
+    def setUp(self):
+        self.rows = sample_rows()
+        keys = sample_headers(self.rows)
+
+        # Not in file order, plus a sensor that never reported
+        self.headers = sorted(keys, reverse=True) + ['m_unreported-nodim']
+
+    def handler_dataset(self, lines=None, columns=None):
+        return {
+            'glider': 'usf-bass',
+            'segment': 0,
+            'headers': self.headers,
+            'lines': lines or [],
+            'columns': columns
+        }
+
+    def assert_same_dataset(self, expected, dataset):
+        np.testing.assert_array_equal(dataset.times, expected.times)
+        assert dataset.time_uv == expected.time_uv
+        assert list(dataset.data_by_type) == list(expected.data_by_type)
+        for key, data in expected.data_by_type.items():
+            np.testing.assert_array_equal(dataset.data_by_type[key], data)
+            assert np.asarray(dataset.data_by_type[key]).dtype == (
+                np.asarray(data).dtype
+            )
+
+    def test_columns_match_lines(self):
+        expected = GliderDataset(self.handler_dataset(lines=self.rows))
+        assert expected.time_uv != NC_FILL_VALUES['f8']
+        assert np.all(
+            expected.data_by_type['m_unreported-nodim'] == NC_FILL_VALUES['f8']
+        )
+
+        dataset = GliderDataset(self.handler_dataset(
+            columns=GliderColumns.from_rows(self.rows)
+        ))
+        self.assert_same_dataset(expected, dataset)
+
+    def test_blocks_match_lines(self):
+        expected = GliderDataset(self.handler_dataset(lines=self.rows))
+
+        blocks = [
+            json.loads(json.dumps(block))
+            for block in GliderColumns.from_rows(self.rows).blocks(64)
+        ]
+        dataset = GliderDataset(self.handler_dataset(
+            columns=GliderColumns.from_blocks(blocks)
+        ))
+        self.assert_same_dataset(expected, dataset)
+
+    def test_without_water_velocity(self):
+        rows = [
+            {key: value for key, value in row.items()
+             if key != 'm_water_vx-m/s'}
+            for row in self.rows
+        ]
+        expected = GliderDataset(self.handler_dataset(lines=rows))
+        dataset = GliderDataset(self.handler_dataset(
+            columns=GliderColumns.from_rows(rows)
+        ))
+        assert expected.time_uv == NC_FILL_VALUES['f8']
+        self.assert_same_dataset(expected, dataset)
+
+
+class FakeDataset(object):
+
+    def __init__(self):
+        self.glider = 'usf-bass'
+        self.segment = 1
+        self.flight_file = 'usf-bass-2014-048-1-0.sbd'
+        self.science_file = 'usf-bass-2014-048-1-0.tbd'
+        self.time_uv = 103.0
+        self.times = np.arange(100.0, 108.0)
+        self.data_by_type = {
+            'm_depth-m': np.arange(8.0),
+            'lat_uv-lat': [27.5]
+        }
+        self.profile_ids = np.array(
+            [np.nan, 101, 101, 101, np.nan, 105, 105, 107],
+            dtype=np.float64
+        )
+
+    def calculate_profiles(self):
+        return self.profile_ids
+
+
+class TestProfiles(unittest.TestCase):
+
+    def test_profile_slices(self):
+        slices = profile_slices(FakeDataset().calculate_profiles())
+        assert slices == [(101.0, 1, 4), (105.0, 5, 7), (107.0, 7, 8)]
+        assert profile_slices([]) == []
+
+    def test_profile_slices_skip_gaps(self):
+        profile_ids = [0, 101, 101, -1, 105, 105, NC_FILL_VALUES['f8'], 107]
+        assert in_profile(profile_ids).tolist() == [
+            False, True, True, False, True, True, False, True
+        ]
+        assert profile_slices(profile_ids) == [
+            (101.0, 1, 3), (105.0, 4, 6), (107.0, 7, 8)
+        ]
+
+    def test_sample_profiles(self):
+        rows = sample_rows()
+        dataset = GliderDataset({
+            'glider': 'usf-bass',
+            'segment': 0,
+            'headers': sample_headers(rows),
+            'lines': rows,
+            'columns': None
+        })
+        profile_ids = dataset.calculate_profiles()
+        assert len(profile_ids) == len(dataset.times)
+
+        slices = profile_slices(profile_ids)
+        assert len(slices) > 0
+
+        # Every row left out of the slices is marked outside a profile
+        covered = np.zeros(len(profile_ids), dtype=bool)
+        for profile_id, start, end in slices:
+            covered[start:end] = True
+        assert not np.any(in_profile(profile_ids)[~covered])
+
+        # Profile IDs are times within their profile
+        for profile_id, start, end in slices:
+            times = dataset.times[start:end]
+            assert times.min() <= profile_id <= times.max()
+
+    def test_glider_profile_pickles_rows(self):
+        dataset = FakeDataset()
+        dataset.times = np.arange(10000.0)
+        dataset.data_by_type['m_depth-m'] = np.arange(10000.0)
+        dataset.profile_ids = np.full(10000, 101.0)
+
+        profile = GliderProfile(dataset, 101.0, 5, 7)
+        sent = pickle.dumps(profile)
+        assert len(sent) < 2000
+
+        received = pickle.loads(sent)
+        assert received.times.tolist() == [5.0, 6.0]
+        assert received.data_by_type['m_depth-m'].tolist() == [5.0, 6.0]
+        assert received.data_by_type['lat_uv-lat'] == [27.5]
+
+    def test_glider_profile_views(self):
+        dataset = FakeDataset()
+        profile = GliderProfile(dataset, 105.0, 5, 7)
+
+        assert profile.profile_id == 105.0
+        assert profile.times.tolist() == [105.0, 106.0]
+        assert profile.calculate_profiles().tolist() == [105.0, 105.0]
+        assert profile.data_by_type['m_depth-m'].base is (
+            dataset.data_by_type['m_depth-m']
+        )
+        assert profile.data_by_type['lat_uv-lat'] == [27.5]
+
+
+def sample_datatypes(dataset):
+    """A datatype for every series of the dataset, stored as doubles
+    along time
+    """
+    datatypes = {}
+    for key in dataset.data_by_type:
+        name, units = key.rsplit('-', 1)
+        datatypes[key] = {
+            'name': name,
+            'type': 'f8',
+            'dimension': 'time',
+            'attrs': {'units': units}
+        }
+    return datatypes
+
+
+class TestWriteNetcdf(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+        rows = sample_rows()
+        self.handler_dataset = {
+            'glider': 'usf-bass',
+            'segment': 0,
+            'flight_file': 'usf-bass-2014-048-1-0.sbd',
+            'science_file': 'usf-bass-2014-048-1-0.tbd',
+            'headers': sample_headers(rows),
+            'lines': rows,
+            'columns': None
+        }
+        dataset = GliderDataset(self.handler_dataset)
+        self.slices = profile_slices(dataset.calculate_profiles())
+
+        self.configs = load_configs(RESOURCES_PATH)
+        self.configs['datatypes'] = sample_datatypes(dataset)
+        self.configs['output_directory'] = self.directory
+        self.configs['profile_files'] = True
+
+    def tearDown(self):
+        stop_profile_writers(self.configs)
+        shutil.rmtree(self.directory)
+
+    def write_sample_set(self):
+        sets = {'usf-bass-sample': dict(self.handler_dataset)}
+        write_netcdf(self.configs, sets, 'usf-bass-sample')
+        assert sets == {}
+
+    def assert_profiles_cataloged(self):
+        entries = query_files(catalog_path(self.configs))
+        assert len(entries) == len(self.slices) > 0
+
+        deployment_directory = os.path.join(
+            self.directory, 'usfbass-20150407T1300Z'
+        )
+        file_paths = sorted(
+            os.path.join(deployment_directory, filename)
+            for filename in os.listdir(deployment_directory)
+        )
+        assert sorted(entry['file_path'] for entry in entries) == file_paths
+
+        entries.sort(key=lambda entry: entry['time_min'])
+        for entry, (profile_id, start, end) in zip(entries, self.slices):
+            assert entry['profile'] == profile_id
+            assert entry['rows'] == end - start
+            assert entry['time_min'] <= profile_id <= entry['time_max']
+            assert entry['glider'] == 'usf-bass'
+            assert entry['segment'] == 0
+            assert entry['flight_file'] == 'usf-bass-2014-048-1-0.sbd'
+            assert entry['science_file'] == 'usf-bass-2014-048-1-0.tbd'
+
+    def test_profile_files(self):
+        self.write_sample_set()
+        self.assert_profiles_cataloged()
+
+    def test_profile_writers(self):
+        self.configs['profile_workers'] = 2
+        assert start_profile_writers(self.configs) is not None
+
+        self.write_sample_set()
+        self.assert_profiles_cataloged()
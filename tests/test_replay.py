@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+import os
+import gzip
+import json
+import shutil
+import socket
+import tempfile
+import unittest
+
+import zmq
+
+from gsps.replay import (
+    RECORDING_FORMAT,
+    ReplayStats,
+    interleave_recordings,
+    read_recording,
+    replay
+)
+
+
+def write_recording(path, glider, offsets):
+    with gzip.open(path, 'wt') as f:
+        f.write(json.dumps({'format': RECORDING_FORMAT, 'version': 1}) + '\n')
+        start = '2014-02-17T00:00:00'
+        messages = [{
+            'message_type': 'set_start',
+            'glider': glider,
+            'start': start,
+            'segment': 0,
+            'headers': []
+        }]
+        for offset in offsets[1:-1]:
+            messages.append({
+                'message_type': 'set_data',
+                'glider': glider,
+                'start': start,
+                'data': {'timestamp': offset}
+            })
+        messages.append({
+            'message_type': 'set_end',
+            'glider': glider,
+            'start': start
+        })
+        for offset, message in zip(offsets, messages):
+            f.write(json.dumps([offset, message]) + '\n')
+
+
+class TestRecordings(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.bass = os.path.join(self.directory, 'usf-bass.gsps.gz')
+        self.gansett = os.path.join(self.directory, 'usf-gansett.gsps.gz')
+        write_recording(self.bass, 'usf-bass', [0.0, 0.1, 0.2, 0.3])
+        write_recording(self.gansett, 'usf-gansett', [0.05, 0.15, 0.25])
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_read_recording(self):
+        entries = list(read_recording(self.bass))
+        assert len(entries) == 4
+        assert entries[0][2]['message_type'] == 'set_start'
+        assert entries[0][2]['start'] == '2014-02-17T00:00:00'
+
+        # Offsets start from the first message
+        entries = list(read_recording(self.gansett))
+        assert entries[0][0] == 0.0
+
+    def test_not_a_recording(self):
+        path = os.path.join(self.directory, 'other.gz')
+        with gzip.open(path, 'wt') as f:
+            f.write('{}\n')
+        with self.assertRaises(ValueError):
+            list(read_recording(path))
+
+    def test_interleave(self):
+        entries = list(interleave_recordings([self.bass, self.gansett]))
+        assert [e[0] for e in entries] == sorted(e[0] for e in entries)
+        assert [e[1] for e in entries[:2]] == [0, 1]
+        assert entries[1][2]['start'] == '2014-02-17T00:00:00-r1'
+
+    def test_replay_monitor(self):
+        # A free port for the external socket
+        probe = socket.socket()
+        probe.bind(('127.0.0.1', 0))
+        zmq_url = 'tcp://127.0.0.1:{}'.format(probe.getsockname()[1])
+        probe.close()
+
+        context = zmq.Context()
+        subscriber = context.socket(zmq.SUB)
+        subscriber.setsockopt(zmq.LINGER, 0)
+        subscriber.connect(zmq_url)
+        subscriber.setsockopt(zmq.SUBSCRIBE, b'')
+
+        try:
+            stats = replay(
+                [self.bass, self.bass, self.gansett],
+                zmq_url,
+                speed=0,
+                wait=0.5,
+                monitor=True
+            )
+
+            messages = []
+            while subscriber.poll(1000):
+                messages.append(subscriber.recv_json())
+        finally:
+            subscriber.close()
+            context.term()
+
+        report = stats.report()
+        assert report['sent'] == 11
+        assert report['received'] == 11
+        assert report['undrained'] == 0
+        assert report['dropped'] == 0
+        assert report['lag_max_s'] >= 0
+        assert report['peak_rss_kb'] > 0
+        assert report['monitor_peak_rss_kb'] > 0
+
+        # Only the monitor's copies are stamped
+        assert len(messages) == 11
+        assert all('replay' not in message for message in messages)
+
+
+class TestReplayStats(unittest.TestCase):
+
+    def test_report_without_monitor(self):
+        stats = ReplayStats()
+        stats.sent = 10
+        assert 'dropped' not in stats.report()
+
+    def test_report_nothing_received(self):
+        stats = ReplayStats()
+        stats.monitored = True
+        stats.sent = 10
+        report = stats.report()
+        assert report['received'] == 0
+        assert report['dropped'] == 10
+        assert report['drop_rate'] == 1.0
+        assert report['lag_max_s'] is None
+
+    def test_report_undrained(self):
+        stats = ReplayStats()
+        stats.monitored = True
+        stats.sent = 10
+        stats.received = 4
+        stats.undrained = 5
+        stats.lags = [0.1] * 4
+        report = stats.report()
+        assert report['undrained'] == 5
+        assert report['dropped'] == 1
+        assert report['drop_rate'] == 0.1
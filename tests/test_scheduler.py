@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import unittest
+
+from gsps.scheduler import SegmentScheduler, segment_order
+
+PAIR = ('sbd', 'tbd')
+
+
+def drain(scheduler):
+    segments = []
+    while len(scheduler):
+        glider, _, file_base, _ = scheduler.next()
+        segments.append((glider, file_base))
+    return segments
+
+
+class TestSegmentOrder(unittest.TestCase):
+
+    def test_segment_order(self):
+        assert segment_order('usf-bass-2014-048-1-2.') == (2014, 48, 1, 2)
+        assert (
+            segment_order('usf-bass-2014-048-1-10.') >
+            segment_order('usf-bass-2014-048-1-9.')
+        )
+        assert segment_order('unknown.') == ()
+
+
+class TestSegmentScheduler(unittest.TestCase):
+
+    def test_round_robin(self):
+        scheduler = SegmentScheduler('fifo')
+        for i in range(3):
+            scheduler.add('usf-bass', '/data/usf-bass',
+                          'usf-bass-2014-048-0-%d.' % i, PAIR)
+        scheduler.add('usf-gansett', '/data/usf-gansett',
+                      'usf-gansett-2014-048-0-0.', PAIR)
+
+        assert drain(scheduler) == [
+            ('usf-bass', 'usf-bass-2014-048-0-0.'),
+            ('usf-gansett', 'usf-gansett-2014-048-0-0.'),
+            ('usf-bass', 'usf-bass-2014-048-0-1.'),
+            ('usf-bass', 'usf-bass-2014-048-0-2.')
+        ]
+
+    def test_newest_first(self):
+        scheduler = SegmentScheduler('newest')
+        for i in range(3):
+            scheduler.add('usf-bass', '/data/usf-bass',
+                          'usf-bass-2014-048-0-%d.' % i, PAIR)
+
+        # Newest goes first, then the backlog in order
+        assert scheduler.next()[2] == 'usf-bass-2014-048-0-2.'
+        assert scheduler.next()[2] == 'usf-bass-2014-048-0-0.'
+
+        # A fresh segment jumps ahead of the remaining backlog
+        scheduler.add('usf-bass', '/data/usf-bass',
+                      'usf-bass-2014-048-0-3.', PAIR)
+        assert drain(scheduler) == [
+            ('usf-bass', 'usf-bass-2014-048-0-3.'),
+            ('usf-bass', 'usf-bass-2014-048-0-1.')
+        ]
+
+    def test_duplicate_ignored(self):
+        scheduler = SegmentScheduler()
+        assert scheduler.add('usf-bass', '/data/usf-bass',
+                             'usf-bass-2014-048-0-0.', PAIR)
+        assert not scheduler.add('usf-bass', '/data/usf-bass',
+                                 'usf-bass-2014-048-0-0.', PAIR)
+        assert len(scheduler) == 1
+
+    def test_stop(self):
+        scheduler = SegmentScheduler()
+        assert scheduler.next(timeout=0.01) is None
+        scheduler.stop()
+        assert scheduler.next() is None
+
+    def test_unknown_policy(self):
+        with self.assertRaises(ValueError):
+            SegmentScheduler('oldest')